@@ -0,0 +1,243 @@
+import argparse
+import itertools
+import json
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple, Optional
+
+from search_methods import heuristics
+from search_methods.solver import Solver
+
+from analysis.utils import MAP_NAMES, load_test_maps
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the memory cap is ignored there
+    resource = None
+
+# Not available on Windows either, the timeout is ignored there
+HAS_ALARM = hasattr(signal, 'SIGALRM')
+
+__all__ = ['Job', 'make_jobs', 'run_batch', 'load_results', 'results_by_config']
+
+
+class Job(NamedTuple):
+    """
+    One solve of the batch
+
+    Attributes:
+    map_name: name of the test level
+    algorithm: algorithm given to the Solver
+    h: name of the heuristic in search_methods.heuristics
+    c: name of the cost function in search_methods.heuristics
+    params: other Solver attributes to set, as (name, value) pairs
+    """
+    map_name: str
+    algorithm: str
+    h: str
+    c: str
+    params: tuple = ()
+
+    @property
+    def config(self) -> str:
+        """Returns the label of the configuration, shared by the jobs that only differ by their map"""
+        label = f"{self.algorithm} {self.h}/{self.c}"
+        for name, value in self.params:
+            label += f" {name}={value}"
+        return label
+
+
+def make_jobs(map_names, algorithms, heuristic_pairs, params: Optional[dict] = None) -> list:
+    """
+    Returns the jobs of every combination of map, algorithm, (h, c) pair and parameter values,
+    params maps a Solver attribute to the list of values to try
+    """
+    params = params or {}
+    grid = [tuple(zip(params, values)) for values in itertools.product(*params.values())]
+
+    return [
+        Job(map_name, algorithm, h, c, combination)
+        for algorithm, (h, c), combination in itertools.product(algorithms, heuristic_pairs, grid)
+        for map_name in map_names
+    ]
+
+
+class _JobTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _JobTimeout
+
+
+_worker = {}
+
+def _init_worker(path: str, memory_limit: Optional[int]) -> None:
+    """Loads the levels once per worker and caps its address space (in MiB)"""
+    _worker['maps'] = load_test_maps(path)
+    if HAS_ALARM:
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+    if memory_limit is not None and resource is not None:
+        limit = memory_limit * 2 ** 20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_job(job: Job, timeout: Optional[float] = None) -> dict:
+    """Solves the job in the current process, returns its result record"""
+    record = {
+        'map': job.map_name,
+        'algorithm': job.algorithm,
+        'h': job.h,
+        'c': job.c,
+        'params': dict(job.params),
+        'config': job.config,
+    }
+
+    solver = Solver(_worker['maps'][job.map_name].copy(), job.algorithm)
+    solver.h = getattr(heuristics, job.h)
+    solver.c = getattr(heuristics, job.c)
+    for name, value in job.params:
+        if not hasattr(solver, name):
+            raise ValueError(f"Unknown solver parameter: {name}")
+        setattr(solver, name, value)
+
+    start_time = time.time()
+    alarm = bool(timeout) and HAS_ALARM
+    if alarm:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        result = solver.solve()
+        states, count, duration, pulls = result
+        record.update(
+            status='ok', count=count, duration=duration, pulls=pulls,
+            solved=states[-1].is_solved(), finished=result.finished
+        )
+    except _JobTimeout:
+        record.update(status='timeout', duration=time.time() - start_time)
+    except MemoryError:
+        record.update(status='memory', duration=time.time() - start_time)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return record
+
+
+def _run_job(job: Job, timeout: Optional[float]) -> dict:
+    try:
+        return run_job(job, timeout)
+    except Exception as error:
+        return {'map': job.map_name, 'config': job.config, 'status': 'error', 'error': repr(error)}
+
+
+def run_batch(
+        jobs: list,
+        output: Optional[str] = None,
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        memory_limit: Optional[int] = None,
+        path: str = 'tests'
+    ) -> list:
+    """
+    Runs the jobs across a process pool and returns their records in completion order.
+    Every record is appended to the output file as a JSON line as soon as its job finishes.
+    A job running longer than timeout seconds is stopped with status 'timeout', one going over
+    memory_limit MiB of address space (the whole worker, imports included) gets status 'memory'.
+    Both limits need POSIX (SIGALRM and RLIMIT_AS), they are ignored on Windows.
+    """
+    records = []
+    file = open(output, 'a') if output else None
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path, memory_limit)) as pool:
+            futures = [pool.submit(_run_job, job, timeout) for job in jobs]
+
+            for future in as_completed(futures):
+                record = future.result()
+                records.append(record)
+
+                if file:
+                    file.write(json.dumps(record) + '\n')
+                    file.flush()
+    finally:
+        if file:
+            file.close()
+
+    return records
+
+
+def load_results(path: str) -> list:
+    """Reads the records of a results file"""
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def results_by_config(records: list, map_names=MAP_NAMES) -> dict:
+    """
+    Groups the successful records as {config: {map_name: {'count', 'duration', 'pulls'}}},
+    the maps in the order of map_names, ready for the plot_* functions
+    """
+    order = {map_name: index for index, map_name in enumerate(map_names)}
+    results = {}
+
+    for record in sorted(records, key=lambda record: order.get(record['map'], len(order))):
+        if record['status'] != 'ok':
+            continue
+
+        results.setdefault(record['config'], {})[record['map']] = {
+            'count': record['count'],
+            'duration': record['duration'],
+            'pulls': record['pulls'],
+        }
+
+    return results
+
+
+def _parse_value(value: str):
+    """Reads a parameter value given on the command line"""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Solves the test levels for every combination of the options")
+    parser.add_argument('--maps', nargs='+', default=MAP_NAMES, help="names of the levels")
+    parser.add_argument('--algorithms', nargs='+', default=['lrta_star'], help="algorithms of the Solver")
+    parser.add_argument('--heuristics', nargs='+', default=['h3:c3'], help="heuristic and cost pairs, as h:c")
+    parser.add_argument('--param', action='append', default=[],
+                        help="Solver attribute and its values, as name=value1,value2 (repeatable)")
+    parser.add_argument('--workers', type=int, default=None, help="processes of the pool (default: cores)")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds allowed per job")
+    parser.add_argument('--memory', type=int, default=None, help="MiB of address space allowed per worker")
+    parser.add_argument('--path', default='tests', help="folder of the yaml levels")
+    parser.add_argument('--output', default='results.jsonl', help="file the results are appended to")
+    args = parser.parse_args(argv)
+
+    params = {}
+    for param in args.param:
+        name, values = param.split('=', 1)
+        params[name] = [_parse_value(value) for value in values.split(',')]
+
+    heuristic_pairs = [tuple(pair.split(':')) for pair in args.heuristics]
+    jobs = make_jobs(args.maps, args.algorithms, heuristic_pairs, params)
+
+    start_time = time.time()
+    records = run_batch(jobs, args.output, args.workers, args.timeout, args.memory, args.path)
+
+    for record in records:
+        if record['status'] == 'ok':
+            print(f"{record['config']:<32} {record['map']:<16} {record['count']:>8} {record['duration']:8.3f}s {record['pulls']:>4}")
+        else:
+            print(f"{record['config']:<32} {record['map']:<16} {record['status']}", file=sys.stderr)
+
+    print(f"{len(records)} jobs in {time.time() - start_time:.2f}s, results in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
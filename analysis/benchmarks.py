@@ -0,0 +1,259 @@
+import glob
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from sokoban import Map, MAP_BACKENDS, LevelPack, pack_yaml
+from search_methods.solver import Solver
+from search_methods.utils import StateDict, state_key
+from search_methods.table import HeuristicTable
+
+from analysis.utils import MAPS, load_test_maps
+
+__all__ = ['benchmark_backends', 'benchmark_solver_option', 'benchmark_beam_width', 'benchmark_heuristic_table',
+           'benchmark_level_pack']
+
+
+def _random_walk(s: Map, steps: int, seed: int) -> float:
+    """Runs a random walk on a copy of the state, expanding every visited state. Returns the duration."""
+    rng = random.Random(seed)
+    s = s.copy()
+
+    start_time = time.perf_counter()
+    for _ in range(steps):
+        moves = s.filter_possible_moves()
+        for move, _ in s.successors():
+            pass
+
+        s.is_solved()
+        s = s.copy()
+        s.apply_move(rng.choice(moves))
+
+    return time.perf_counter() - start_time
+
+
+def benchmark_backends(
+        map_names=('large_map1', 'large_map2', 'super_hard_map1'),
+        backends=tuple(MAP_BACKENDS),
+        algorithms=('beam_search', 'lrta_star'),
+        steps=20000,
+        seed=0
+    ) -> dict:
+    """
+    Compares the board backends of MAP_BACKENDS on the given levels.
+    For every backend it times a random walk expanding each state, then solves the level with each algorithm.
+    """
+    results = {}
+    for backend in backends:
+        maps = load_test_maps(backend=MAP_BACKENDS[backend])
+
+        for map_name in map_names:
+            s = maps[map_name]
+            result = {'walk': _random_walk(s, steps, seed)}
+
+            for algorithm in algorithms:
+                _, count, duration, _ = Solver(s.copy(), algorithm).solve()
+                result[algorithm] = {'count': count, 'duration': duration}
+
+            results[(backend, map_name)] = result
+
+    return results
+
+
+def benchmark_solver_option(
+        option: str,
+        values=(False, True),
+        maps: dict = MAPS,
+        algorithms=('beam_search', 'lrta_star')
+    ) -> dict:
+    """
+    Solves every map with each value of a Solver attribute (e.g. 'prune_deadlocks').
+    Returns {(algorithm, map_name): {value: {'count', 'duration', 'pulls'}}}.
+    """
+    results = {}
+    for algorithm in algorithms:
+        for map_name, s in maps.items():
+            results[(algorithm, map_name)] = {}
+
+            for value in values:
+                solver = Solver(s.copy(), algorithm)
+                setattr(solver, option, value)
+                _, count, duration, pulls = solver.solve()
+
+                results[(algorithm, map_name)][value] = {'count': count, 'duration': duration, 'pulls': pulls}
+
+    return results
+
+
+def benchmark_beam_width(
+        widths=(2, 4, 8, 16, 32, 64, 128, 256, 512),
+        maps: dict = None
+    ) -> dict:
+    """
+    Solves every test level with beam search for each beam width K.
+    The heuristic calls count the generated successors: a flat time per successor across the widths
+    means the cost of a layer stays linear in K times the branching factor.
+    Returns {(map_name, K): {'count', 'successors', 'duration', 'solved'}}.
+    """
+    if maps is None:
+        maps = load_test_maps()
+
+    results = {}
+    for map_name, s in maps.items():
+        for K in widths:
+            solver = Solver(s.copy(), 'beam_search')
+            solver.K = K
+
+            successors = 0
+            h = solver.h
+
+            def _counting_h(state, *args):
+                nonlocal successors
+                successors += 1
+                return h(state, *args)
+
+            solver.h = _counting_h
+            states, count, duration, _ = solver.solve()
+
+            results[(map_name, K)] = {
+                'count': count,
+                'successors': successors,
+                'duration': duration,
+                'solved': states[-1].is_solved(),
+            }
+
+    return results
+
+
+def _random_states(s: Map, count: int, seed: int) -> list:
+    """Returns up to count distinct states met by a random walk on a copy of the state (at most 50 * count steps)"""
+    rng = random.Random(seed)
+    s = s.copy()
+
+    states = {}
+    for _ in range(50 * count):
+        s.apply_move(rng.choice(s.filter_possible_moves()))
+        states.setdefault(s.key, s.copy())
+
+        if len(states) == count:
+            break
+
+    return list(states.values())
+
+
+def benchmark_heuristic_table(map_name: str = 'super_hard_map1', entries: int = 20000, seed: int = 0) -> dict:
+    """
+    Compares StateDict and HeuristicTable as the LRTA* table H on states of a random walk.
+    Returns {table: {'bytes_per_entry', 'inserts_per_second', 'lookups_per_second'}}, the memory being
+    the traced allocations of the filled table: as in a search, the keys cached on the states are dropped,
+    so only the keys held by the table count.
+    """
+    states = _random_states(load_test_maps()[map_name], entries, seed)
+
+    results = {}
+    for name, table_class in (('StateDict', StateDict), ('HeuristicTable', HeuristicTable)):
+        for s in states:
+            s._key = None
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        H = table_class(state_key)
+
+        start_time = time.perf_counter()
+        for index, s in enumerate(states):
+            # Heuristic values of the size LRTA* stores
+            H.get_or_insert(s, lambda: index % 200 + 1)
+        insert_duration = time.perf_counter() - start_time
+
+        # Only the keys held by the table stay allocated
+        for s in states:
+            s._key = None
+
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        start_time = time.perf_counter()
+        for s in states:
+            H.get(s)
+        lookup_duration = time.perf_counter() - start_time
+
+        results[name] = {
+            'bytes_per_entry': memory / len(H),
+            'inserts_per_second': len(states) / insert_duration,
+            'lookups_per_second': len(states) / lookup_duration,
+        }
+
+    return results
+
+
+def benchmark_level_pack(path: str = 'tests', copies: int = 50) -> dict:
+    """
+    Compares loading the yaml levels of the folder with loading them from a level pack, every level
+    repeated copies times. Returns {loader: {'levels', 'duration', 'levels_per_second'}} for the yaml files,
+    the whole pack and one level of the pack (opening included), plus the sizes of the files in bytes.
+    """
+    yaml_paths = sorted(glob.glob(os.path.join(path, '*.yaml'))) * copies
+
+    with tempfile.TemporaryDirectory() as directory:
+        pack_path = os.path.join(directory, 'levels.pack')
+        pack_yaml(pack_path, yaml_paths)
+
+        start_time = time.perf_counter()
+        for yaml_path in yaml_paths:
+            Map.from_yaml(yaml_path)
+        yaml_duration = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with LevelPack(pack_path) as pack:
+            for _ in pack:
+                pass
+        pack_duration = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with LevelPack(pack_path) as pack:
+            pack[len(pack) // 2]
+        single_duration = time.perf_counter() - start_time
+
+        pack_bytes = os.path.getsize(pack_path)
+
+    levels = len(yaml_paths)
+    return {
+        'yaml': {'levels': levels, 'duration': yaml_duration, 'levels_per_second': levels / yaml_duration},
+        'pack': {'levels': levels, 'duration': pack_duration, 'levels_per_second': levels / pack_duration},
+        'pack_one': {'levels': 1, 'duration': single_duration, 'levels_per_second': 1 / single_duration},
+        'bytes': {'yaml': sum(os.path.getsize(yaml_path) for yaml_path in yaml_paths), 'pack': pack_bytes},
+    }
+
+
+if __name__ == '__main__':
+    for (backend, map_name), result in benchmark_backends().items():
+        line = f"{backend:>6} {map_name:<16} walk: {result['walk']:.3f}s"
+        for algorithm, values in result.items():
+            if algorithm != 'walk':
+                line += f" | {algorithm}: {values['count']} states in {values['duration']:.3f}s"
+        print(line)
+
+    for option in ('prune_dead_squares', 'prune_deadlocks'):
+        print(f"Explored states without -> with {option}")
+        for (algorithm, map_name), result in benchmark_solver_option(option).items():
+            print(f"{algorithm:>12} {map_name:<16} {result[False]['count']} -> {result[True]['count']}")
+
+    print("Beam width: expanded states, generated successors, time per successor")
+    for (map_name, K), result in benchmark_beam_width().items():
+        per_successor = result['duration'] / result['successors'] * 1e6 if result['successors'] else 0.0
+        print(f"{map_name:<16} K={K:<4} {result['count']:>7} {result['successors']:>8} "
+              f"{per_successor:6.1f}us {'solved' if result['solved'] else 'failed'}")
+
+    print("LRTA* table H: memory per entry, inserts and lookups per second")
+    for name, result in benchmark_heuristic_table().items():
+        print(f"{name:<16} {result['bytes_per_entry']:6.1f} B/entry "
+              f"{result['inserts_per_second']:>10.0f} inserts/s {result['lookups_per_second']:>10.0f} lookups/s")
+
+    print("Level loading: yaml files against a level pack")
+    result = benchmark_level_pack()
+    for loader in ('yaml', 'pack', 'pack_one'):
+        values = result[loader]
+        print(f"{loader:<8} {values['levels']:>5} levels in {values['duration']:.3f}s ({values['levels_per_second']:.0f} levels/s)")
+    print(f"Size: {result['bytes']['yaml']} B of yaml, {result['bytes']['pack']} B of pack")
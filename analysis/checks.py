@@ -0,0 +1,243 @@
+import copy
+import pickle
+import random
+from collections import deque
+
+from sokoban import Map
+from sokoban.xsb import parse_xsb, to_xsb
+from sokoban.dummy import Dummy
+from sokoban.moves import *
+
+from search_methods.astar import astar
+from search_methods.bidirectional import bidirectional
+from search_methods.heuristics import h4
+from search_methods.solver import Solver
+
+from analysis.utils import load_test_maps
+
+__all__ = ['reference_possible_moves', 'check_move_tables', 'random_levels', 'check_admissible',
+           'check_xsb_round_trip', 'check_solve_result_pickle',
+           'check_pruning']
+
+
+def reference_possible_moves(s: Map) -> list:
+    """
+    Returns the possible moves of the state computed position by position with Dummy,
+    the way Map did before the move tables of the level.
+    """
+    obstacles = set(s.obstacles)
+    boxes = s.positions_of_boxes
+
+    def _in_bounds(pos):
+        return 0 <= pos[0] < s.length and 0 <= pos[1] < s.width
+
+    def _free(pos):
+        return _in_bounds(pos) and pos not in obstacles and pos not in boxes
+
+    def _player_valid(move):
+        future_position = s.player.get_future_position(move)
+        if not _in_bounds(future_position) or future_position in obstacles:
+            return False
+
+        if future_position in boxes:
+            return _free(Dummy(*future_position).get_future_position(move))
+
+        return True
+
+    def _box_valid(move):
+        implicit_move = move - 4
+        if not _player_valid(implicit_move):
+            return False
+
+        if s.player.get_future_position(implicit_move) in boxes:
+            return True
+
+        return s.player.get_opposite_position(implicit_move) in boxes
+
+    possible_moves = []
+    for move in range(LEFT, BOX_DOWN + 1):
+        if (move < BOX_LEFT and _player_valid(move)) or (move >= BOX_LEFT and _box_valid(move)):
+            possible_moves.append(move)
+
+    return possible_moves
+
+
+def check_move_tables(maps: dict = None, max_states: int = 20000) -> dict:
+    """
+    Explores up to max_states states of every map (breadth first, all the levels in tests/ by default) and checks that
+    Map.filter_possible_moves returns the same moves as reference_possible_moves.
+    Returns the number of checked states per map and raises AssertionError on the first mismatch.
+    """
+    if maps is None:
+        maps = load_test_maps()
+
+    checked = {}
+    for map_name, start in maps.items():
+        queue = deque([start.copy()])
+        seen = {start.key}
+
+        while queue and len(seen) <= max_states:
+            s = queue.popleft()
+
+            moves = s.filter_possible_moves()
+            expected = reference_possible_moves(s)
+            assert moves == expected, f"{map_name}: {moves} != {expected} for state\n{s}"
+
+            for move in moves:
+                s_prime = s.copy()
+                s_prime.apply_move(move)
+                if s_prime.key not in seen:
+                    seen.add(s_prime.key)
+                    queue.append(s_prime)
+
+        checked[map_name] = len(seen)
+
+    return checked
+
+
+def random_levels(count: int, length: int = 6, width: int = 6, boxes: int = 2, walls: int = 6, seed: int = 0) -> list:
+    """Returns count random levels: walls, targets, boxes and the player on distinct random cells"""
+    rng = random.Random(seed)
+    cells = [(x, y) for x in range(length) for y in range(width)]
+
+    levels = []
+    for index in range(count):
+        chosen = rng.sample(cells, walls + 2 * boxes + 1)
+        obstacles = chosen[:walls]
+        targets = chosen[walls:walls + boxes]
+        box_positions = chosen[walls + boxes:walls + 2 * boxes]
+        player_x, player_y = chosen[-1]
+
+        boxes_list = [(f"box{x}_{y}", x, y) for x, y in box_positions]
+        levels.append(Map(length, width, player_x, player_y, boxes_list, targets, obstacles, test_name=f"random{index}"))
+
+    return levels
+
+
+def _zero(s: Map, visited=None) -> int:
+    return 0
+
+
+def check_admissible(h: callable = h4, levels: list = None) -> dict:
+    """
+    Solves small random levels with A* and h, and with A* and h = 0 (breadth first, optimal).
+    Checks that h never overestimates the optimal length from the start state and that A* with h
+    returns solutions of the optimal length. Returns the number of solvable and unsolvable levels
+    checked and raises AssertionError on the first failure.
+    """
+    if levels is None:
+        levels = random_levels(200)
+
+    checked = {'solvable': 0, 'unsolvable': 0}
+    for s in levels:
+        optimal_states, _, _ = astar(s.copy(), _zero)
+        if not optimal_states[-1].is_solved():
+            checked['unsolvable'] += 1
+            continue
+
+        optimal = len(optimal_states) - 1
+        assert h(s.copy()) <= optimal, f"{s.test_name}: h = {h(s.copy())} > {optimal} for state\n{s}"
+
+        states, _, _ = astar(s.copy(), h)
+        assert len(states) - 1 == optimal, f"{s.test_name}: A* found {len(states) - 1} moves, {optimal} suffice\n{s}"
+        checked['solvable'] += 1
+
+    return checked
+
+
+def check_xsb_round_trip(maps: dict = None) -> list:
+    """
+    Writes every map (all the levels in tests/ by default) with to_xsb, parses it back and checks that the level
+    and the start state are unchanged: dimensions, walls, targets, box and player cells, and the same XSB text.
+    Returns the names of the checked maps and raises AssertionError on the first mismatch.
+    """
+    if maps is None:
+        maps = load_test_maps()
+
+    for map_name, s in maps.items():
+        text = to_xsb(s)
+        parsed = list(parse_xsb(text.split('\n')))
+        assert len(parsed) == 1, f"{map_name}: read back as {len(parsed)} levels\n{text}"
+
+        s_prime = parsed[0]
+        assert (s_prime.length, s_prime.width) == (s.length, s.width), f"{map_name}: dimensions changed\n{text}"
+        assert s_prime.level.walls == s.level.walls, f"{map_name}: walls changed\n{text}"
+        assert s_prime.level.target_cells == s.level.target_cells, f"{map_name}: targets changed\n{text}"
+        assert s_prime.key == s.key, f"{map_name}: boxes or player changed\n{text}"
+        assert to_xsb(s_prime) == text, f"{map_name}: XSB text changed\n{text}"
+
+    return list(maps)
+
+
+def check_solve_result_pickle(map_name: str = 'medium_map1') -> list:
+    """
+    Solves the map with every algorithm, with and without a budget for the ones supporting it, and checks
+    that the SolveResult survives pickle (as returned by a batch worker) and deepcopy with its values and attributes.
+    Returns the labels of the checked results and raises AssertionError on the first mismatch.
+    """
+    s = load_test_maps()[map_name]
+    runs = [(algorithm, None) for algorithm in ('lrta_star', 'beam_search', 'astar', 'ida_star', 'bidirectional')]
+    runs += [('lrta_star', 5), ('beam_search', 5)]
+
+    checked = []
+    for algorithm, max_steps in runs:
+        result = Solver(s.copy(), algorithm).solve(max_steps=max_steps)
+        label = f"{algorithm} max_steps={max_steps}"
+
+        for copied in (pickle.loads(pickle.dumps(result)), copy.deepcopy(result)):
+            assert type(copied) is type(result), f"{label}: {type(copied)}"
+            assert [str(state) for state in copied.states] == [str(state) for state in result.states], label
+            assert copied[1:] == result[1:], f"{label}: {copied[1:]} != {result[1:]}"
+            assert (copied.finished, copied.reason) == (result.finished, result.reason), label
+            assert str(copied.best_state) == str(result.best_state), label
+
+        checked.append(label)
+
+    return checked
+
+
+def check_pruning(option: str = 'prune_dead_squares', levels: list = None) -> dict:
+    """
+    Checks that the pruning option only cuts states that can't be solved: on small random levels (and a box in
+    the corner of an open room, which can only leave it by a pull), A* with the option finds a solution of the
+    optimal length whenever A* with h = 0 finds one, and so does the bidirectional search with pulls.
+    Returns the number of solvable and unsolvable levels checked and raises AssertionError on the first failure.
+    """
+    if levels is None:
+        corner_room = Map(6, 6, 0, 5, [('box0_0', 0, 0)], [(3, 1)], [], test_name='corner_room')
+        levels = [corner_room] + random_levels(300, seed=1)
+
+    options = {option: True}
+    checked = {'solvable': 0, 'unsolvable': 0}
+    for s in levels:
+        optimal_states, _, _ = astar(s.copy(), _zero)
+        if not optimal_states[-1].is_solved():
+            checked['unsolvable'] += 1
+            continue
+
+        states, _, _ = astar(s.copy(), h4, **options)
+        assert len(states) == len(optimal_states) and states[-1].is_solved(), \
+            f"{s.test_name}: A* with {option} lost the solution of {len(optimal_states) - 1} moves\n{s}"
+
+        states, _, _ = bidirectional(s.copy(), allow_pulls=True, **options)
+        assert states[-1].is_solved(), f"{s.test_name}: bidirectional search with {option} lost the solution\n{s}"
+        checked['solvable'] += 1
+
+    return checked
+
+
+if __name__ == '__main__':
+    for map_name, count in check_move_tables().items():
+        print(f"{map_name}: move tables match on {count} states")
+
+    print(f"XSB round trip: {len(check_xsb_round_trip())} levels unchanged")
+    print(f"SolveResult pickle and deepcopy: {len(check_solve_result_pickle())} results unchanged")
+
+    for option in ('prune_dead_squares', 'prune_deadlocks'):
+        checked = check_pruning(option)
+        print(f"{option} sound: solutions kept on {checked['solvable']} random levels "
+              f"({checked['unsolvable']} unsolvable skipped)")
+
+    checked = check_admissible()
+    print(f"h4 admissible: optimal A* solutions on {checked['solvable']} random levels "
+          f"({checked['unsolvable']} unsolvable skipped)")
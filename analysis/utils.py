@@ -1,12 +1,14 @@
-from sokoban import Map
+from sokoban import Map, read_xsb
 from search_methods.solver import Solver
 from search_methods.lrta_star import *
 
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib as mpl
+import glob
+import os
 
-__all__ = ['MAP_NAMES', 'MAPS', 'plot_single_characteristic', 'plot_all_characteristics', 'plot_single_result']
+__all__ = ['MAP_NAMES', 'MAPS', 'load_test_maps', 'plot_single_characteristic', 'plot_all_characteristics', 'plot_single_result']
 
 MAP_NAMES = [
     'easy_map1',
@@ -22,6 +24,22 @@ MAP_NAMES = [
 MAPS = {name: Map.from_yaml(f'tests/{name}.yaml') for name in MAP_NAMES}
 
 
+def load_test_maps(path='tests', backend=Map):
+    """
+    Loads every yaml level of the folder (including the ones missing from MAPS), keyed by name,
+    then every level of its XSB files (*.xsb), named by their titles or after their file.
+    """
+    maps = {}
+    for file_path in sorted(glob.glob(os.path.join(path, '*.yaml'))):
+        s = backend.from_yaml(file_path)
+        maps[s.test_name] = s
+
+    for file_path in sorted(glob.glob(os.path.join(path, '*.xsb'))):
+        for s in read_xsb(file_path, backend):
+            maps[s.test_name] = s
+    return maps
+
+
 def plot_single_characteristic(results1, results2, characteristic, heuristic_names=None, title=None, log_scale=True, figsize=(12, 6), color_scheme=None):
     """
     Creates a bar plot comparing a single characteristic between two heuristics across different maps.
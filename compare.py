@@ -2,42 +2,25 @@ from sokoban import Map
 from search_methods.solver import Solver
 from search_methods.lrta_star import *
 from analysis.utils import *
+from analysis.batch import make_jobs, run_batch, results_by_config
 
 import matplotlib.pyplot as plt
 import numpy as np
 
 
-results1 = {}
-results2 = {}
+if __name__ == '__main__':
+    # Both configurations of every map are solved in parallel
+    jobs = make_jobs(MAP_NAMES, ['lrta_star'], [('h1', 'c1'), ('h3', 'c3')])
+    results = results_by_config(run_batch(jobs))
 
-for map_name, map in MAPS.items():
-    print(f"Solving {map_name}...")
-    solver1 = Solver(map.copy(), 'lrta_star')
-    solver1.h = h1
-    solver1.c = c1
-    s1, count1, duration1, pulls1 = solver1.solve()
+    results1 = results['lrta_star h1/c1']
+    results2 = results['lrta_star h3/c3']
 
-    solver2 = Solver(map.copy(), 'lrta_star')
-    solver2.h = h3
-    solver2.c = c3
-    s2, count2, duration2, pulls2 = solver2.solve()
-
-    results1[map_name] = {
-        'count': count1,
-        'duration': duration1,
-        'pulls': pulls1
-    }
-    results2[map_name] = {
-        'count': count2,
-        'duration': duration2,
-        'pulls': pulls2
-    }
-
-fig, axes = plot_all_characteristics(
-    results1,
-    results2,
-    heuristic_names=('h1', 'h3'),
-    title='Performance Comparison: LRTA* h1 vs h3',
-    log_scale=True
-)
-plt.show()
+    fig, axes = plot_all_characteristics(
+        results1,
+        results2,
+        heuristic_names=('h1', 'h3'),
+        title='Performance Comparison: LRTA* h1 vs h3',
+        log_scale=True
+    )
+    plt.show()
@@ -4,43 +4,37 @@ from sokoban import Map
 from search_methods.solver import Solver
 from search_methods.lrta_star import *
 from analysis.utils import *
+from analysis.batch import make_jobs, run_batch, results_by_config
 from sokoban.gif import *
 
 import matplotlib.pyplot as plt
 import numpy as np
 
-algorithm = sys.argv[1] if len(sys.argv) > 1 else 'lrta_star'
 
-map = MAPS['easy_map1']
-solver = Solver(map.copy(), algorithm)
-solver.h = h3
-solver.c = c3
+if __name__ == '__main__':
+    algorithm = sys.argv[1] if len(sys.argv) > 1 else 'lrta_star'
 
-states, count, duration, pulls = solver.solve(display=True)
-
-# Animate the solution
-save_images(states, 'images/map1_images/')
-# create_gif('images/map1_images/', 'solution', 'images') # Sometimes not working
-
-results = {}
-for map_name, map in MAPS.items():
-    print(f"Solving {map_name}...")
+    map = MAPS['easy_map1']
     solver = Solver(map.copy(), algorithm)
     solver.h = h3
     solver.c = c3
-    s, count, duration, pulls = solver.solve(display=False)
-
-    results[map_name] = {
-        'count': count,
-        'duration': duration,
-        'pulls': pulls
-    }
-
-fig, axes = plot_single_result(
-    results,
-    characteristic='count',
-    heuristic_name=algorithm,
-    title=f'Solution Steps per Map for {algorithm}',
-    log_scale=True
-)
-plt.show()
\ No newline at end of file
+
+    states, count, duration, pulls = solver.solve(display=True)
+
+    # Animate the solution
+    save_images(states, 'images/map1_images/')
+    # create_gif('images/map1_images/', 'solution', 'images') # Sometimes not working
+
+    # Every map is solved in parallel
+    print(f"Solving {len(MAPS)} maps...")
+    jobs = make_jobs(MAP_NAMES, [algorithm], [('h3', 'c3')])
+    results = results_by_config(run_batch(jobs))[f'{algorithm} h3/c3']
+
+    fig, axes = plot_single_result(
+        results,
+        characteristic='count',
+        heuristic_name=algorithm,
+        title=f'Solution Steps per Map for {algorithm}',
+        log_scale=True
+    )
+    plt.show()
\ No newline at end of file
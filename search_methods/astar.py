@@ -0,0 +1,105 @@
+import heapq
+from typing import Tuple, List, Optional
+
+from sokoban.map import Map
+from sokoban.moves import *
+
+from search_methods.heuristics import *
+from search_methods.utils import *
+from search_methods.trace import SolutionTrace
+from search_methods.macro import macro_successors, normalized_key
+
+TIE_BREAKING = (None, 'high_g', 'low_h')
+
+def astar(
+        s: Map,
+        h: Optional[callable] = h4,
+        tie_breaking: Optional[str] = 'high_g',
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False,
+        macro_moves: bool = False
+    ) -> Tuple[List[Map], int, int]:
+    """
+    Solves the map using the A* algorithm, every move costs 1.
+    The open list is a binary heap of compact states (player cell, box cells), the closed set holds state keys.
+    Complete: returns the start state alone if the map has no solution.
+    Optimal when h is admissible and consistent (e.g. h4 with its 'move' metric, not h3 nor the 'push' metric),
+    for equal f the tie is broken in favour of
+    the deepest node ('high_g'), the lowest heuristic ('low_h') or the oldest node (None).
+    With macro_moves, the nodes are keyed by their normalized key and every box push or pull costs 1
+    (the walks are free), so the solution minimises the box moves instead of the player moves.
+    prune_dead_squares keeps it complete and optimal: a dead square is a cell from which a box can't reach
+    any target even with pulls, so only states that can't be solved are cut.
+    So does prune_deadlocks: a frozen box can be neither pushed nor pulled off its cell.
+    """
+    if tie_breaking not in TIE_BREAKING:
+        raise ValueError(f"Unknown tie breaking: {tie_breaking}")
+
+    level = s.level
+    start = s.copy()
+    start_key = normalized_key(start) if macro_moves else start.key
+
+    count = 0
+    order = 0
+    open_list = []
+    best_g = {start_key: 0}
+    parents = {start_key: (None, None)}
+    closed = set()
+
+    def _push(g, h_value, key, state):
+        nonlocal order
+        if tie_breaking == 'high_g':
+            tie = -g
+        elif tie_breaking == 'low_h':
+            tie = h_value
+        else:
+            tie = 0
+
+        heapq.heappush(open_list, (g + h_value, tie, order, g, key, state))
+        order += 1
+
+    _push(0, h(start), start_key, (start.player_cell, tuple(start.box_cells)))
+
+    while open_list:
+        _, _, _, g, key, (player_cell, box_cells) = heapq.heappop(open_list)
+        if key in closed or g > best_g[key]:
+            continue
+
+        closed.add(key)
+        crt_s = s.__class__.from_level(level, player_cell, box_cells)
+
+        if crt_s.is_solved():
+            moves = []
+            while parents[key][0] is not None:
+                key, move = parents[key]
+                moves.append(move)
+
+            if macro_moves:
+                moves = [move for macro in reversed(moves) for move in macro]
+            else:
+                moves = moves[::-1]
+
+            states = SolutionTrace(start, moves)
+            return states, count, states.pulls
+
+        count += 1
+        if macro_moves:
+            for moves, new_s, new_key in macro_successors(crt_s, prune_dead_squares, prune_deadlocks):
+                if new_key in closed or best_g.get(new_key, float('inf')) <= g + 1:
+                    continue
+
+                best_g[new_key] = g + 1
+                parents[new_key] = (key, moves)
+                _push(g + 1, h(new_s), new_key, (new_s.player_cell, tuple(new_s.box_cells)))
+            continue
+
+        for move, new_key in crt_s.successors(prune_dead_squares, prune_deadlocks):
+            # The move is applied on crt_s while the successor is inspected
+            if new_key in closed or best_g.get(new_key, float('inf')) <= g + 1:
+                continue
+
+            best_g[new_key] = g + 1
+            parents[new_key] = (key, move)
+            _push(g + 1, h(crt_s), new_key, (crt_s.player_cell, tuple(crt_s.box_cells)))
+
+    return [start], count, 0
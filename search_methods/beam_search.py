@@ -1,48 +1,181 @@
-from typing import Tuple
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Optional
 
 from search_methods.utils import *
 from sokoban.map import Map
 from sokoban.moves import *
 from search_methods.lrta_star import *
+from search_methods.macro import macro_successors
+from search_methods.budget import Budget
 
 def beam_search(
         s: Map,
         K: int,
         h: callable,
-        c: callable
+        c: callable,
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False,
+        macro_moves: bool = False,
+        workers: int = 0,
+        budget: Optional[Budget] = None
     ) -> Tuple[List[Map], int, int]:
+    """
+    Solves the map using beam search of width K.
+    With prune_dead_squares, the successors leaving a box on a dead square of the level are dropped.
+    With prune_deadlocks, the successors with a freeze deadlock are dropped.
+    With macro_moves, the successors are the box pushes and pulls, deduplicated by normalized key.
+    Every successor is checked for the goal once, when generated.
+    With more than one worker, the parents of each layer are expanded by a process pool (same result).
+    With a budget, the search stops before a layer once a limit is reached (steps are expanded states,
+    the table is the visited set) and the budget keeps the candidate with the lowest heuristic value.
+    Returns the start state alone if the beam runs dry or the budget runs out.
+    """
+    if workers > 1:
+        return _parallel_beam_search(s, K, h, c, prune_dead_squares, prune_deadlocks, macro_moves, workers, budget)
+
     steps = 0
     pulls = 0
 
-    visited = StateDict(hash)
-    s_list = [(s, float('inf'))]
+    # Keys of every state that entered a candidate list, the candidates are unique by construction
+    visited = set()
+    s_list = [s]
+
+    while s_list:
+        if budget is not None and budget.exhausted(steps, len(visited)):
+            break
 
-    while True:
         cand_list = []
-        for crt_s, _ in s_list:
-            moves = crt_s.filter_possible_moves()
-            for move in moves:
-                new_s = result(crt_s, move)
-                if new_s in visited:
-                    continue
+        for crt_s in s_list:
+            if macro_moves:
+                for moves, new_s, key in macro_successors(crt_s, prune_dead_squares, prune_deadlocks):
+                    if key in visited:
+                        continue
+
+                    visited.add(key)
+                    if new_s.is_solved():
+                        # Skip saving all the states, for beam_search the representation is not very useful
+                        return [new_s], steps, pulls
 
-                cand_list.append((new_s, h(new_s) + c(crt_s, move, new_s)))
-                visited[new_s] = 1
+                    h_value = h(new_s)
+                    if budget is not None:
+                        budget.offer(new_s, h_value)
 
-            for (test, h_value) in cand_list:
-                if test.is_solved():
-                    # Skip saving all the states, for beam_search the rpresentation is not
-                    # very useful
-                    return [test], steps, pulls
+                    cand_list.append((h_value + c(crt_s, moves[-1], new_s), new_s))
+            else:
+                # Only copy the successors that were not visited yet
+                new_moves = []
+                for move, key in crt_s.successors(prune_dead_squares, prune_deadlocks):
+                    if key not in visited:
+                        visited.add(key)
+                        new_moves.append(move)
 
-        cand_list.sort(key=lambda x: x[1])
+                for move in new_moves:
+                    new_s = result(crt_s, move)
+                    if new_s.is_solved():
+                        return [new_s], steps, pulls
 
-        # Make sure that the selected candidates are unique
-        s_list = []
-        for cand in cand_list:
-            if hash(cand[0]) not in [hash(s) for s, _ in s_list]:
-                s_list.append(cand)
+                    h_value = h(new_s)
+                    if budget is not None:
+                        budget.offer(new_s, h_value)
 
-        s_list = s_list[:K]
+                    cand_list.append((h_value + c(crt_s, move, new_s), new_s))
+
+        # The K best candidates, the first generated wins a tie
+        s_list = [new_s for _, new_s in heapq.nsmallest(K, cand_list, key=lambda cand: cand[0])]
 
         steps += len(s_list)
+
+    # The beam ran dry without reaching the goal
+    return [s], steps, pulls
+
+# Parallel mode: every worker process holds the level and the scoring functions, the parents travel
+# as compact states and come back as (key, h value, score, solved, compact child) tuples in generation order.
+# The parent process merges them in the serial order, so the visited set and the tie breaking
+# (first generated wins) give the same beam as the serial mode.
+
+_worker = {}
+
+def _compact(s: Map) -> tuple:
+    """Returns the picklable part of a state that depends on the search"""
+    return s.player_cell, tuple(s.box_cells), s.explored_states, s.undo_moves
+
+def _restore(cls: type, level, compact: tuple) -> Map:
+    """Rebuilds the state of the level from its compact form"""
+    player_cell, box_cells, explored_states, undo_moves = compact
+    s = cls.from_level(level, player_cell, box_cells)
+    s.explored_states = explored_states
+    s.undo_moves = undo_moves
+    return s
+
+def _init_worker(cls, level, h, c, prune_dead_squares, prune_deadlocks, macro_moves):
+    """Stores the static data of the search in the worker process"""
+    _worker.update(
+        cls=cls, level=level, h=h, c=c,
+        prune_dead_squares=prune_dead_squares, prune_deadlocks=prune_deadlocks, macro_moves=macro_moves
+    )
+
+def _expand(parents: List[tuple]) -> List[List[tuple]]:
+    """Expands a shard of compact parents, returns the scored children of every parent"""
+    h, c = _worker['h'], _worker['c']
+    prune_dead_squares, prune_deadlocks = _worker['prune_dead_squares'], _worker['prune_deadlocks']
+
+    expanded = []
+    for parent in parents:
+        crt_s = _restore(_worker['cls'], _worker['level'], parent)
+        children = []
+
+        if _worker['macro_moves']:
+            for moves, new_s, key in macro_successors(crt_s, prune_dead_squares, prune_deadlocks):
+                h_value = h(new_s)
+                children.append((key, h_value, h_value + c(crt_s, moves[-1], new_s), new_s.is_solved(), _compact(new_s)))
+        else:
+            for move in [move for move, _ in crt_s.successors(prune_dead_squares, prune_deadlocks)]:
+                new_s = result(crt_s, move)
+                h_value = h(new_s)
+                children.append((new_s.key, h_value, h_value + c(crt_s, move, new_s), new_s.is_solved(), _compact(new_s)))
+
+        expanded.append(children)
+
+    return expanded
+
+def _parallel_beam_search(s, K, h, c, prune_dead_squares, prune_deadlocks, macro_moves, workers, budget):
+    """Beam search of width K with the parents of each layer sharded across a process pool"""
+    cls, level = s.__class__, s.level
+    steps = 0
+    pulls = 0
+
+    visited = set()
+    s_list = [_compact(s)]
+
+    initargs = (cls, level, h, c, prune_dead_squares, prune_deadlocks, macro_moves)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        while s_list:
+            if budget is not None and budget.exhausted(steps, len(visited)):
+                break
+
+            # Contiguous shards, so the merge below follows the serial generation order
+            size = -(-len(s_list) // workers)
+            shards = [s_list[i:i + size] for i in range(0, len(s_list), size)]
+
+            cand_list = []
+            for expanded in pool.map(_expand, shards):
+                for children in expanded:
+                    for key, h_value, score, solved, child in children:
+                        if key in visited:
+                            continue
+
+                        visited.add(key)
+                        if solved:
+                            return [_restore(cls, level, child)], steps, pulls
+
+                        if budget is not None and h_value < budget.best_h:
+                            budget.offer(_restore(cls, level, child), h_value)
+
+                        cand_list.append((score, child))
+
+            s_list = [child for _, child in heapq.nsmallest(K, cand_list, key=lambda cand: cand[0])]
+
+            steps += len(s_list)
+
+    return [s], steps, pulls
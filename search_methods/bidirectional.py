@@ -0,0 +1,139 @@
+from typing import Tuple, List
+
+from sokoban.map import Map
+from sokoban.moves import *
+
+from search_methods.utils import *
+from search_methods.trace import SolutionTrace
+from search_methods.macro import reachable, macro_successors, normalized_key, apply_moves
+
+def goal_states(s: Map) -> List[Map]:
+    """Returns one solved state per player region of the goal configuration (a box on every target)"""
+    level = s.level
+    box_cells = list(level.ordered_target_cells)
+
+    states = []
+    seen = set(box_cells)
+    for cell in range(level.size):
+        if level.walls[cell] or cell in seen:
+            continue
+
+        goal = s.__class__.from_level(level, cell, box_cells.copy())
+        seen.update(reachable(goal))
+        states.append(goal)
+
+    return states
+
+def bidirectional(
+        s: Map,
+        allow_pulls: bool = False,
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False
+    ) -> Tuple[List[Map], int, int]:
+    """
+    Solves the map with a bidirectional breadth first search over box moves.
+    The forward search pushes the boxes from the start state, the backward search pulls them from every
+    goal state, a pull being the reverse of a push. The layer of the smaller frontier is expanded first.
+    The frontiers meet on a normalized key (box cells and player region), the move sequence is then
+    stitched by following the keys from the start state and validated by replaying it.
+    With allow_pulls, both searches push and pull (the move set is its own reverse).
+    The pruning only applies to the forward search.
+    Returns the start state alone if the map has no solution.
+    """
+    if len(s.box_cells) != len(s.level.target_cells):
+        raise ValueError("Bidirectional search needs as many boxes as targets")
+
+    start = s.copy()
+    if start.is_solved():
+        return [start], 0, 0
+
+    # Parent key of every key reached by each search, None for the roots
+    start_key = normalized_key(start)
+    forward = {start_key: None}
+    forward_frontier = [(start, start_key)]
+
+    backward = {}
+    backward_frontier = []
+    for goal in goal_states(start):
+        goal_key = normalized_key(goal)
+        backward[goal_key] = None
+        backward_frontier.append((goal, goal_key))
+
+    forward_options = {
+        'prune_dead_squares': prune_dead_squares,
+        'prune_deadlocks': prune_deadlocks,
+        'pushes': True,
+        'pulls': allow_pulls
+    }
+    backward_options = {'pushes': allow_pulls, 'pulls': True}
+
+    count = 0
+    meeting = None
+
+    while forward_frontier and backward_frontier and meeting is None:
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, parents, others, options = forward_frontier, forward, backward, forward_options
+        else:
+            frontier, parents, others, options = backward_frontier, backward, forward, backward_options
+
+        next_frontier = []
+        for crt_s, crt_key in frontier:
+            count += 1
+            for _, s_prime, key in macro_successors(crt_s, **options):
+                if key in parents:
+                    continue
+
+                parents[key] = crt_key
+                if key in others:
+                    meeting = key
+                    break
+
+                next_frontier.append((s_prime, key))
+
+            if meeting is not None:
+                break
+
+        if parents is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    if meeting is None:
+        return [start], count, 0
+
+    # Keys from the start state to the meeting key, then from the meeting key to a goal state
+    keys = []
+    key = meeting
+    while key is not None:
+        keys.append(key)
+        key = forward[key]
+    keys.reverse()
+
+    key = backward[meeting]
+    while key is not None:
+        keys.append(key)
+        key = backward[key]
+
+    # Replaying the trace raises a ValueError on an invalid move
+    states = SolutionTrace(start, _stitch(start, keys[1:], allow_pulls))
+    if not states[-1].is_solved():
+        raise RuntimeError("The stitched move sequence does not solve the map")
+
+    return states, count, states.pulls
+
+def _stitch(start: Map, keys: List[int], allow_pulls: bool) -> List[int]:
+    """Returns the moves going through the normalized keys in order, one box move at a time"""
+    s = start.copy()
+    moves = []
+
+    for key in keys:
+        for macro, _, macro_key in macro_successors(s, pulls=allow_pulls):
+            if macro_key == key:
+                break
+        else:
+            raise RuntimeError("The search path can't be stitched, no box move reaches the next key")
+
+        apply_moves(s, macro)
+        moves += macro
+
+    return moves
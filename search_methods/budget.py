@@ -0,0 +1,80 @@
+import time
+from typing import List, Optional
+
+from sokoban.map import Map
+
+__all__ = ['Budget', 'SolveResult']
+
+
+class Budget:
+    """
+    Limits of a search run, checked by the engine once per step
+
+    Attributes:
+    max_time: wall-clock seconds the search may run, None for no limit
+    max_steps: steps (states explored) the search may take, None for no limit
+    max_table_size: entries of the search table (H for LRTA*, visited keys for beam search), None for no limit
+    reason: 'time', 'steps' or 'table_size' once a limit stopped the search, None otherwise
+    best_state: state with the lowest heuristic value offered by the engine
+    best_h: heuristic value of best_state
+    """
+    def __init__(self, max_time: Optional[float] = None, max_steps: Optional[int] = None, max_table_size: Optional[int] = None):
+        self.max_time = max_time
+        self.max_steps = max_steps
+        self.max_table_size = max_table_size
+        self.start()
+
+    def start(self) -> None:
+        """Starts the clock and forgets the previous run"""
+        self.start_time = time.time()
+        self.reason = None
+        self.best_state = None
+        self.best_h = float('inf')
+
+    def exhausted(self, steps: int, table_size: int) -> bool:
+        """Checks the limits, records the first one reached"""
+        if self.max_steps is not None and steps >= self.max_steps:
+            self.reason = 'steps'
+        elif self.max_table_size is not None and table_size >= self.max_table_size:
+            self.reason = 'table_size'
+        elif self.max_time is not None and time.time() - self.start_time >= self.max_time:
+            self.reason = 'time'
+
+        return self.reason is not None
+
+    def offer(self, s: Map, h_value: float) -> None:
+        """Keeps a copy of the state if its heuristic value is the lowest seen so far"""
+        if h_value < self.best_h:
+            self.best_h = h_value
+            self.best_state = s.copy()
+
+
+class SolveResult(tuple):
+    """
+    Result of Solver.solve, unpacks to (states, count, duration, pulls) like before
+
+    Attributes:
+    states, count, duration, pulls: the four values of the tuple
+    finished: False if a budget stopped the search
+    reason: limit of the budget that stopped the search, None if it finished
+    best_state: state with the lowest heuristic value reached (None without a budget)
+    """
+    def __new__(cls, states: List[Map], count: int, duration: float, pulls: int,
+                finished: bool = True, reason: Optional[str] = None, best_state: Optional[Map] = None):
+        result = super().__new__(cls, (states, count, duration, pulls))
+        result.finished = finished
+        result.reason = reason
+        result.best_state = best_state
+        return result
+
+    def __reduce__(self):
+        # The extra attributes are not part of the tuple, pickle and deepcopy rebuild them through __new__
+        return SolveResult, (*self, self.finished, self.reason, self.best_state)
+
+    states = property(lambda self: self[0])
+    count = property(lambda self: self[1])
+    duration = property(lambda self: self[2])
+    pulls = property(lambda self: self[3])
+
+    def __repr__(self):
+        return f"SolveResult(count={self.count}, duration={self.duration:.4f}, pulls={self.pulls}, finished={self.finished})"
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+__all__ = ['LRUCache']
+
+
+class LRUCache:
+    """
+    Size-bounded memoization table with hit/miss counters.
+
+    When the table is full, the oldest entry is evicted: with the 'lru' policy an entry
+    gets younger every time it is read, with the 'fifo' policy only insertions count.
+    A maxsize of 0 disables the cache (nothing is stored, every lookup is a miss).
+
+    Attributes:
+    maxsize: maximum number of entries
+    policy: eviction policy, 'lru' or 'fifo'
+    hits: number of lookups that found their entry
+    misses: number of lookups that did not
+    evictions: number of entries dropped to make room
+    """
+    def __init__(self, maxsize: int = 2 ** 16, policy: str = 'lru'):
+        if policy not in ('lru', 'fifo'):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Returns the entry of the key, or default on a miss"""
+        try:
+            value = self.table[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        if self.policy == 'lru':
+            self.table.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        self.table[key] = value
+        if len(self.table) > self.maxsize:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.table
+
+    def __len__(self):
+        return len(self.table)
+
+    def resize(self, maxsize: int) -> None:
+        """Changes the maximum number of entries, evicting the oldest ones if needed"""
+        self.maxsize = maxsize
+        while len(self.table) > max(maxsize, 0):
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counters"""
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Returns the fraction of lookups that found their entry"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Returns the counters of the cache"""
+        return {
+            'size': len(self.table),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+    def __str__(self):
+        return f"LRUCache({len(self.table)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses, {self.evictions} evictions)"
@@ -1,19 +1,33 @@
 from typing import Tuple, Optional
+from collections import deque
 
 from sokoban.map import Map
-from sokoban.dummy import Dummy
 from sokoban.moves import *
 
 from search_methods.utils import *
+from search_methods.matching import Matching
+from search_methods.cache import LRUCache
 
-def h1(s: Map, visited: Optional[dict] = None) -> int:
+# The heuristics only read the tables precomputed by the level of the state
+# metric selects the distance between a box and a target: 'manhattan', 'push' (push-only distances)
+# or 'move' (box moves, pushes or pulls, a lower bound)
+
+# Memoizes the visited-independent parts of h3 and c3, keyed by the level and the cells of the boxes
+# (the boxes are told apart by name, so unlike the state key the order of the cells matters)
+# Resize it with heuristic_cache.resize(maxsize), 0 disables it
+heuristic_cache = LRUCache(maxsize=2 ** 16)
+
+def h1(s: Map, visited: Optional[dict] = None, metric: str = 'manhattan') -> int:
     """Basic manhattan distance heuristic."""
+    level = s.level
+    nearest_target_distance = level.nearest_target_distance[metric]
+
     return (
         # distance from player to closest box
-        min(manhattan(s.player, box) for box in s.boxes.values()) +
+        min(level.manhattan(s.player_cell, box_cell) for box_cell in s.box_cells) +
 
         # distance from each box to its nearest goal
-        sum(min(manhattan(box, goal) for goal in s.targets) for box in s.boxes.values())
+        sum(nearest_target_distance[box_cell] for box_cell in s.box_cells)
     )
 
 def c1(s: Map, a: int, s_prime: Optional[Map], visited: Optional[dict] = None) -> int:
@@ -21,34 +35,38 @@ def c1(s: Map, a: int, s_prime: Optional[Map], visited: Optional[dict] = None) -
     return 1
 
 
-def h2(s: Map, visited: Optional[dict] = None) -> int:
+def h2(s: Map, visited: Optional[dict] = None, metric: str = 'manhattan') -> int:
     """
     Heuristic that considers the distance from the player to his required position
     and the distance from the box to the goal.
     """
+    level = s.level
+    target_distances = level.target_distances[metric]
     total = 0
 
     # Match each box with a random goal
-    for box, goal in zip(s.boxes.values(), s.targets):
-        # Add the manhattan distance from the box to the goal
-        total += manhattan(box, goal)
+    for box_cell, distances in zip(s.box_cells, target_distances):
+        # Add the distance from the box to the goal
+        total += distances[box_cell]
 
     # Now get the closest box to the player
-    box = min(s.boxes.values(), key=lambda box: manhattan(s.player, box))
-    goal = min(s.targets, key=lambda goal: manhattan(box, goal))
+    box_cell = min(s.box_cells, key=lambda box_cell: level.manhattan(s.player_cell, box_cell))
+    goal = min(range(len(level.targets)), key=lambda goal: target_distances[goal][box_cell])
 
     # Now check the direction in which the box should be pushed, so that the player
     # should go behind the direction of the box as much as possible
-    diff = (box.x - goal[0], box.y - goal[1])
+    box_x, box_y = level.position(box_cell)
+    goal_x, goal_y = level.targets[goal]
+    diff = (box_x - goal_x, box_y - goal_y)
     if abs(diff[0]) > abs(diff[1]):
         direction = (sign(diff[0]), 0)
     else:
         direction = (0, sign(diff[1]))
 
-    required_player_pos = (box.x + direction[0], box.y + direction[1])
+    required_player_pos = (box_x + direction[0], box_y + direction[1])
 
     # Add the manhattan distance from the player to the required position
-    total += manhattan(s.player, required_player_pos)
+    total += manhattan(level.position(s.player_cell), required_player_pos)
 
     return total
 
@@ -57,51 +75,68 @@ def c2(s: Map, a: int, s_prime: Optional[Map], visited: Optional[dict] = None) -
     return 1
 
 
-def h3(s: Map, visited: Optional[dict] = None) -> int:
-    """Heuristic that considers the distance from the boxes to their goals."""
-    total = 0
-    walls = get_walls(s)
-    boxes_to_check, targets_remaining = get_boxes_and_goals(s)
+def _boxes_and_goals(s: Map) -> Tuple[list, list]:
+    """Returns the indexes of the boxes and of the targets not yet satisfied, in the order of the level"""
+    target_cells = s.level.target_cells
+    boxes_to_check = [box for box, box_cell in enumerate(s.box_cells) if box_cell not in target_cells]
+    targets_remaining = [goal for goal, target_cell in enumerate(s.level.ordered_target_cells) if target_cell not in s.box_cells]
 
-    # If all boxes are in their goals, return 0
-    if len(boxes_to_check) == 0:
-        return 0
+    return boxes_to_check, targets_remaining
+
+def _h3_base(s: Map, metric: str) -> Tuple[int, list]:
+    """Returns the visited-independent part of h3 and the boxes not yet in their goals"""
+    level = s.level
+    target_distances = level.target_distances[metric]
+    total = 0
+    boxes_to_check, targets_remaining = _boxes_and_goals(s)
 
     for box in boxes_to_check:
-        # Match each box with a goal
-        goal = min(targets_remaining, key=lambda goal: manhattan(box, Dummy(*goal)))
+        box_cell = s.box_cells[box]
 
-        # Add the manhattan distance from the box to the goal
-        total += manhattan(box, goal)
+        # Match each box with a goal and add the distance from the box to the goal
+        total += min(target_distances[goal][box_cell] for goal in targets_remaining)
 
         # Check if the box is in a corner and penalize it
-        if corner(box, walls):
+        if level.corners[box_cell]:
             total += 100
 
-        # Check if the box was previosuly here and penalize it
-        if visited is not None and visited[(box.name, box.xy)]:
-            total += 10 * visited[(box.name, box.xy)]
+    return total, boxes_to_check
+
+def h3(s: Map, visited: Optional[dict] = None, metric: str = 'manhattan') -> int:
+    """Heuristic that considers the distance from the boxes to their goals."""
+    key = ('h3', metric, s.level, tuple(s.box_cells))
+    entry = heuristic_cache.get(key)
+    if entry is None:
+        entry = _h3_base(s, metric)
+        heuristic_cache[key] = entry
+
+    # If all boxes are in their goals, the total is 0
+    total, boxes_to_check = entry
+
+    # Check if the boxes were previosuly here and penalize them
+    if visited is not None:
+        level = s.level
+        for box in boxes_to_check:
+            box_key = (level.box_names[box], level.position(s.box_cells[box]))
+            if visited[box_key]:
+                total += 10 * visited[box_key]
 
     return total
 
 def c3(s: Map, a: int, s_prime: Optional[Map] = None, visited: Optional[dict] = None) -> int:
     """Returns the cost of executing action a in state s."""
+    level = s.level
 
-    def _best_move(s: Map, visited: Optional[dict] = None) -> Tuple[dict, dict]:
-        # Get where the box should go next and where the player should be placed
-        # to push the box in the right direction
-        walls = get_walls(s)
-        boxes_to_check, targets_remaining = get_boxes_and_goals(s)
-
-        # If all boxes are in their goals, return None
-        if len(boxes_to_check) == 0:
-            return None, None
-        
-        # For each box, get the closest goal and the direction in which the box should be pushed
-        boxes = {}
-        players = {}
+    def _candidate_moves(s: Map) -> list:
+        # For each box, get the closest goal and the directions in which the box could be pushed
+        # This part doesn't depend on visited, so it is memoized
+        boxes_to_check, targets_remaining = _boxes_and_goals(s)
+
+        candidates = []
         for box, goal in zip(boxes_to_check, targets_remaining):
-            diff = (-(box.x - goal[0]), -(box.y - goal[1]))
+            box_x, box_y = level.position(s.box_cells[box])
+            goal_x, goal_y = level.targets[goal]
+            diff = (goal_x - box_x, goal_y - box_y)
 
             if abs(diff[0]) > abs(diff[1]):
                 directions = [(sign(diff[0]), 0), (0, sign(diff[1])), (0, -sign(diff[1])), (-sign(diff[0]), 0)]
@@ -109,54 +144,126 @@ def c3(s: Map, a: int, s_prime: Optional[Map] = None, visited: Optional[dict] =
                 directions = [(0, sign(diff[1])), (sign(diff[0]), 0), (-sign(diff[0]), 0), (0, -sign(diff[1]))]
 
             # Filter out directions that are not valid
-            directions = [d for d in directions.copy() if (box.x + d[0], box.y + d[1]) not in walls]
-            directions = [d for d in directions.copy() if not corner((box.x + d[0], box.y + d[1]), walls)]
-            directions = [d for d in directions.copy() if (box.x + d[0], box.y + d[1]) not in s.positions_of_boxes.keys()]
+            directions = [d for d in directions if not level.is_wall(box_x + d[0], box_y + d[1])]
+            directions = [d for d in directions if not level.corners[level.cell(box_x + d[0], box_y + d[1])]]
+            directions = [d for d in directions if level.cell(box_x + d[0], box_y + d[1]) not in s.box_cells]
+
+            candidates.append((box, box_x, box_y, directions))
+
+        return candidates
 
+    def _best_move(s: Map, visited: Optional[dict] = None) -> Tuple[dict, dict]:
+        # Get where the box should go next and where the player should be placed
+        # to push the box in the right direction
+        key = ('c3', s.level, tuple(s.box_cells))
+        candidates = heuristic_cache.get(key)
+        if candidates is None:
+            candidates = _candidate_moves(s)
+            heuristic_cache[key] = candidates
+
+        boxes = {}
+        players = {}
+        for box, box_x, box_y, directions in candidates:
             if visited is not None:
-                aux = [d for d in directions.copy() if visited[(box.name, (box.x + d[0], box.y + d[1]))] == 0]
+                box_name = level.box_names[box]
+                aux = [d for d in directions if visited[(box_name, (box_x + d[0], box_y + d[1]))] == 0]
                 if len(aux) > 0:
                     directions = aux
 
             # Now for each possible direction, check if the player can push or pull the box
             for d in directions:
-                player_pos = (box.x - d[0], box.y - d[1])
-                if (player_pos[0], player_pos[1]) not in walls:
-                    players[box.name] = Dummy(*player_pos)
-                    boxes[box.name] = Dummy(box.x + d[0], box.y + d[1])
+                player_pos = (box_x - d[0], box_y - d[1])
+                if not level.is_wall(*player_pos):
+                    players[box] = player_pos
+                    boxes[box] = level.cell(box_x + d[0], box_y + d[1])
                     break
 
-            if box.name in boxes:
+            if box in boxes:
                 continue
 
             for d in directions:
-                player_pos = (box.x + d[0], box.y + d[1])
-                if (player_pos[0], player_pos[1]) not in walls:
-                    players[box.name] = Dummy(*player_pos)
-                    boxes[box.name] = Dummy(box.x + d[0], box.y + d[1])
+                player_pos = (box_x + d[0], box_y + d[1])
+                if not level.is_wall(*player_pos):
+                    players[box] = player_pos
+                    boxes[box] = level.cell(box_x + d[0], box_y + d[1])
                     break
 
         return boxes, players
-    
-    if not s_prime:
-        s_prime = result(s, a)
 
-    boxes1, _ = get_boxes_and_goals(s)
-    boxes2, _ = get_boxes_and_goals(s_prime)
+    if not s_prime:
+        # Look one step ahead in place instead of copying the board
+        token = s.apply_move(a)
+        s_prime_box_cells, s_prime_player_cell = s.box_cells.copy(), s.player_cell
+        s_prime_boxes_on_targets = s.boxes_on_targets
+        s.undo_move(token)
+    else:
+        s_prime_box_cells, s_prime_player_cell = s_prime.box_cells, s_prime.player_cell
+        s_prime_boxes_on_targets = s_prime.boxes_on_targets
 
-    if len(boxes1) < len(boxes2):
+    # More boxes left out of their goals
+    if s_prime_boxes_on_targets < s.boxes_on_targets:
         return 50
 
     best_boxes, best_players = _best_move(s, visited)
-    for box, best_pos in best_boxes.items():
-        if s_prime.boxes[box].x == best_pos.x and s_prime.boxes[box].y == best_pos.y:
+    for box, best_cell in best_boxes.items():
+        if s_prime_box_cells[box] == best_cell:
             # If the box is in the right position, return 0
             return 0
 
     # If the box is not in the right position, return the manhattan distance
     # from player to his closest position
-    aux = [manhattan(s_prime.player, player) for player in best_players.values()]
+    s_prime_player_pos = level.position(s_prime_player_cell)
+    aux = [manhattan(s_prime_player_pos, player_pos) for player_pos in best_players.values()]
     if len(aux) == 0:
-        return min(manhattan(s_prime.player, box) for box in s.boxes.values())
+        return min(level.manhattan(s_prime_player_cell, box_cell) for box_cell in s.box_cells)
 
     return min(aux)
+
+
+# Matchings of the last box configurations evaluated by h4, a state usually
+# differs from one of them by the single box that was moved
+_recent_matchings = deque(maxlen=8)
+
+def _matching_costs(s: Map, metric: str) -> list:
+    """Returns the square cost matrix box x target, padded with zero costs when the counts differ"""
+    target_distances = s.level.target_distances[metric]
+    size = max(len(s.box_cells), len(target_distances))
+    padding = [0] * (size - len(target_distances))
+
+    costs = [[distances[box_cell] for distances in target_distances] + padding for box_cell in s.box_cells]
+    costs += [[0] * size for _ in range(size - len(s.box_cells))]
+
+    return costs
+
+def h4(s: Map, visited: Optional[dict] = None, metric: str = 'move') -> int:
+    """
+    Cost of the minimum cost perfect matching between boxes and targets.
+    Admissible and consistent with the 'move' and 'manhattan' metrics (every move shifts one box by one cell),
+    not with 'push': pulls are legal, so the push distances can overestimate.
+    The matching is repaired incrementally when only one box moved since a recently evaluated state.
+    """
+    box_cells = tuple(s.box_cells)
+    costs = _matching_costs(s, metric)
+
+    for level, cells, matching_metric, matching in reversed(_recent_matchings):
+        if level is not s.level or matching_metric != metric:
+            continue
+
+        moved = [box for box, (cell, box_cell) in enumerate(zip(cells, box_cells)) if cell != box_cell]
+        if len(moved) == 0:
+            return matching.cost(costs)
+
+        if len(moved) == 1:
+            matching = matching.copy()
+            matching.update_row(costs, moved[0])
+            break
+    else:
+        matching = Matching(costs)
+
+    _recent_matchings.append((s.level, box_cells, metric, matching))
+
+    return matching.cost(costs)
+
+def c4(s: Map, a: int, s_prime: Optional[Map], visited: Optional[dict] = None) -> int:
+    """Returns the cost of executing action a in state s."""
+    return 1
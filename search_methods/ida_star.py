@@ -0,0 +1,84 @@
+from typing import Tuple, List, Optional
+
+from sokoban.map import Map
+from sokoban.moves import *
+
+from search_methods.heuristics import *
+from search_methods.utils import *
+from search_methods.trace import SolutionTrace
+
+def ida_star(
+        s: Map,
+        h: Optional[callable] = h4,
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False
+    ) -> Tuple[List[Map], int, int]:
+    """
+    Solves the map using the IDA* algorithm, every move costs 1.
+    Memory-bounded: a depth first search applies and undoes the moves in place, only the current
+    path is stored, and the f = g + h threshold grows to the smallest value that exceeded it.
+    Returns the start state alone if the map has no solution.
+    prune_dead_squares and prune_deadlocks keep it complete and optimal, they only cut states that can't be solved.
+    """
+    start = s.copy()
+    s = s.copy()
+
+    if s.is_solved():
+        return [start], 0, 0
+
+    count = 0
+    threshold = h(s)
+
+    while True:
+        next_threshold = float('inf')
+
+        moves = []
+        tokens = []
+        path_keys = [s.key]
+        on_path = {s.key}
+
+        # Moves left to try for every node of the path
+        stack = [iter(s.filter_possible_moves(prune_dead_squares))]
+        count += 1
+
+        while stack:
+            move = next(stack[-1], None)
+
+            if move is None:
+                # Every move of the node was tried, backtrack
+                stack.pop()
+                if tokens:
+                    s.undo_move(tokens.pop())
+                    moves.pop()
+                    on_path.discard(path_keys.pop())
+                continue
+
+            token = s.apply_move(move)
+
+            if s.key in on_path or \
+               (prune_deadlocks and token.box_index != -1 and s.is_deadlocked(s.box_cells[token.box_index])):
+                s.undo_move(token)
+                continue
+
+            f = len(tokens) + 1 + h(s)
+            if f > threshold:
+                next_threshold = min(next_threshold, f)
+                s.undo_move(token)
+                continue
+
+            tokens.append(token)
+            moves.append(move)
+            path_keys.append(s.key)
+            on_path.add(s.key)
+
+            if s.is_solved():
+                states = SolutionTrace(start, moves)
+                return states, count, states.pulls
+
+            stack.append(iter(s.filter_possible_moves(prune_dead_squares)))
+            count += 1
+
+        if next_threshold == float('inf'):
+            return [start], count, 0
+
+        threshold = next_threshold
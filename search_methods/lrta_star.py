@@ -1,4 +1,5 @@
-from typing import Tuple, Optional, List
+import os
+from typing import Tuple, Optional, List, NamedTuple
 from collections import defaultdict
 
 from sokoban.map import Map
@@ -6,69 +7,256 @@ from sokoban.moves import *
 
 from search_methods.heuristics import *
 from search_methods.utils import *
+from search_methods.macro import macro_successors, normalized_key
+from search_methods.budget import Budget
+from search_methods.trace import SolutionTrace
+from search_methods.table import HeuristicTable
+
+class Expansion(NamedTuple):
+    """
+    Actions evaluated by the LRTA* agent in a state, kept to update H of that state on the next step
+
+    Attributes:
+    state_key: key of the expanded state
+    actions: the candidate actions (a move, or the moves of a macro move)
+    successors: the successor of each action for macro moves, None otherwise
+    keys: H key of the successor of each action
+    costs: cost of each action when it was evaluated
+    fresh: False if visited changed since the costs were evaluated
+    """
+    state_key: int
+    actions: list
+    successors: Optional[list]
+    keys: list
+    costs: list
+    fresh: bool = True
 
 def lrta_star_agent(
         s: Map,
         h: callable,
         c: callable,
-        H: StateDict,
+        H: StateDict | HeuristicTable,
         s_prev: Optional[Map] = None,
         visited: Optional[dict] = None,
-    ) -> int:
-    """Returns the action to execute in the current state of the map using the LRTA* algorithm."""
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False,
+        macro_moves: bool = False,
+        cache: Optional[dict] = None
+    ) -> int | List[int]:
+    """
+    Returns the action to execute in the current state of the map using the LRTA* algorithm.
+    With macro_moves, the action is the list of moves of a macro move (walk then push or pull).
+    With a cache, the expansion of s is stored in cache['expansion'] and reused on the next step to update H[s_prev]:
+    only the actions whose cost may have changed since (the ones reaching s, or all of them if visited changed)
+    are evaluated again, so every step generates the successors of a single state.
+    """
+
+    def _cost(s: Map, a: int) -> Tuple[int, int]:
+        """Returns the cost of executing action a in state s and the H key of the successor, looking ahead in place."""
+        step_cost = c(s, a, None, visited)
+
+        token = s.apply_move(a)
+        key = H.function(s)
+        if prune_deadlocks and token.box_index != -1 and s.is_deadlocked(s.box_cells[token.box_index]):
+            # The successor can never be solved
+            cost = float('inf')
+        else:
+            value = H.get(s)
+            if value == 0:
+                cost = h(s, visited) + step_cost
+            else:
+                cost = step_cost + value + 50
+        s.undo_move(token)
+
+        return cost, key
+
+    def _macro_cost(s: Map, moves: List[int], s_prime: Map) -> int:
+        """Returns the cost of executing the macro move in state s, reaching s_prime."""
+        step_cost = c(s, moves[-1], s_prime, visited)
+
+        value = H.get(s_prime)
+        if value == 0:
+            return h(s_prime, visited) + step_cost
 
-    def _cost(s: Map, a: str, s_prime: Optional[Map]):
-        """Returns the cost of executing action a in state s."""
-        if s_prime is None or s_prime not in H:
-            s_prime = result(s, a)
-            return h(s_prime, visited) + c(s, a, s_prime, visited)
+        return step_cost + value + 50
 
-        return c(s, a, s_prime, visited) + H[s_prime] + 50
+    def _action_cost(s: Map, expansion: Expansion, index: int) -> int:
+        """Evaluates again the action of the expansion of s."""
+        if macro_moves:
+            return _macro_cost(s, expansion.actions[index], expansion.successors[index])
+        return _cost(s, expansion.actions[index])[0]
+
+    def _expand(s: Map) -> Expansion:
+        """Generates the actions of the state and evaluates them."""
+        if macro_moves:
+            candidates = list(macro_successors(s, prune_dead_squares, prune_deadlocks))
+            actions = [moves for moves, _, _ in candidates]
+            successors = [s_prime for _, s_prime, _ in candidates]
+            keys = [key for _, _, key in candidates]
+            costs = [_macro_cost(s, moves, s_prime) for moves, s_prime in zip(actions, successors)]
+            return Expansion(s.key, actions, successors, keys, costs)
+
+        actions = possible_moves(s, prune_dead_squares)
+        evaluated = [_cost(s, a) for a in actions]
+        return Expansion(s.key, actions, None, [key for _, key in evaluated], [cost for cost, _ in evaluated])
 
     if s.is_solved():
         return None
     
-    if s not in H:
-        H[s] = h(s, visited)
+    H.get_or_insert(s, lambda: h(s, visited))
 
     if s_prev:
-        H[s_prev] = min([_cost(s_prev, b, result(s_prev, b)) for b in s_prev.filter_possible_moves()])
+        expansion = cache.get('expansion') if cache is not None else None
+
+        if expansion is None or expansion.state_key != s_prev.key:
+            costs = _expand(s_prev).costs
+        elif not expansion.fresh:
+            costs = [_action_cost(s_prev, expansion, i) for i in range(len(expansion.actions))]
+        else:
+            # Since the evaluation, H only changed for s (its entry was just made)
+            s_key = H.function(s)
+            costs = [
+                _action_cost(s_prev, expansion, i) if key == s_key else cost
+                for i, (key, cost) in enumerate(zip(expansion.keys, expansion.costs))
+            ]
+
+        H[s_prev] = min(costs, default=float('inf'))
+
+    expansion = _expand(s)
+    if not expansion.actions:
+        # No box can be moved anymore
+        return None
 
-    a = min([b for b in s.filter_possible_moves()], key=lambda b: _cost(s, b, result(s, b)))
+    # The first action of minimal cost
+    a = expansion.actions[expansion.costs.index(min(expansion.costs))]
 
     moved_box = box_was_moved(s_prev, s)
     if moved_box:
         # If a box was moved, update the heuristic for the new state
         visited[(moved_box.name, moved_box.xy)] += 1
 
+    if cache is not None:
+        cache['expansion'] = expansion._replace(fresh=not moved_box)
+
     return a
 
 def lrta_star(
         s: Map,
         h: Optional[callable] = h3,
-        c: Optional[callable] = c3
-    ) -> Tuple[List[Map], int, int]:
-    """Solves the map using the LRTA* algorithm."""
+        c: Optional[callable] = c3,
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False,
+        macro_moves: bool = False,
+        budget: Optional[Budget] = None,
+        compact_table: bool = False,
+        H: Optional[StateDict | HeuristicTable] = None
+    ) -> Tuple[SolutionTrace, int, int]:
+    """
+    Solves the map using the LRTA* algorithm.
+    The path is returned as a SolutionTrace (start state and moves), read like the list of states.
+    With prune_dead_squares, the agent avoids the moves leaving a box on a dead square of the level
+    (a cell from which the box can't reach any target, even with pulls).
+    With prune_deadlocks, the moves creating a freeze deadlock (a box off the targets that can be neither
+    pushed nor pulled) get an infinite cost.
+    With macro_moves, the agent chooses between box pushes and pulls (the walks are replayed as steps)
+    and H is keyed by the normalized state key.
+    With a budget, the agent stops once a limit is reached (steps are moves, the table is H)
+    and the budget keeps the state of the path with the lowest heuristic value.
+    With compact_table, H is a HeuristicTable (open addressing over 64-bit fingerprints) instead of a StateDict.
+    A table H learned by a previous run on the same level can be given to start warm, it is updated in place.
+    """
 
     count = 0
     pulls = 0
     s_prev = s.copy()
-    H = StateDict(hash)
+    if H is None:
+        H = new_table(macro_moves, compact_table)
+    elif H.function is not (normalized_key if macro_moves else state_key):
+        raise ValueError("The table H is not keyed for this mode (macro moves use normalized keys)")
     visited = defaultdict(lambda: 0)
-    states = [s.copy()]
+    states = SolutionTrace(s)
+    cache = {}
 
     while True:
-        a = lrta_star_agent(s, h, c, H, s_prev, visited)
+        if budget is not None:
+            budget.offer(s, h(s))
+            if budget.exhausted(count, len(H)):
+                break
+
+        a = lrta_star_agent(s, h, c, H, s_prev, visited, prune_dead_squares, prune_deadlocks, macro_moves, cache)
         if a is None:
             break
 
         s_prev = s.copy()
-        s.apply_move(a)
+        for move in (a if macro_moves else [a]):
+            token = s.apply_move(move)
 
-        if box_was_pulled(s_prev, s):
-            pulls += 1
+            if token.pulled:
+                pulls += 1
 
-        states.append(s.copy())
-        count += 1
+            states.append(move)
+            count += 1
 
+    states.finish(s, pulls)
     return states, count, pulls
+
+def new_table(macro_moves: bool, compact_table: bool) -> StateDict | HeuristicTable:
+    """Returns an empty table H for the mode"""
+    function = normalized_key if macro_moves else state_key
+    return HeuristicTable(function) if compact_table else StateDict(function)
+
+def lrta_star_trials(
+        s: Map,
+        h: Optional[callable] = h3,
+        c: Optional[callable] = c3,
+        trials: int = 10,
+        table_path: Optional[str] = None,
+        patience: int = 1,
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False,
+        macro_moves: bool = False,
+        budget: Optional[Budget] = None,
+        compact_table: bool = False,
+        H: Optional[StateDict | HeuristicTable] = None
+    ) -> Tuple[SolutionTrace, int, int, List[int]]:
+    """
+    Runs LRTA* from the start state up to trials times, every trial starting with the table H learned by the
+    previous ones (visited is reset). Stops early after patience trials in a row without a shorter solution.
+    With table_path, H is loaded from the file if it exists and saved to it at the end, so the next solves
+    of the level start warm. A table H given directly is used instead and updated in place.
+    Returns the shortest solution found (or the first path if none is solved), the steps of its trial,
+    its pulls and the steps of every trial.
+    """
+    if H is None:
+        if table_path is not None and os.path.exists(table_path):
+            table_class = HeuristicTable if compact_table else StateDict
+            H = table_class.load(table_path, normalized_key if macro_moves else state_key)
+        else:
+            H = new_table(macro_moves, compact_table)
+
+    best = None
+    trial_counts = []
+    since_best = 0
+
+    for _ in range(trials):
+        states, count, pulls = lrta_star(
+            s.copy(), h, c, prune_dead_squares, prune_deadlocks, macro_moves, budget, compact_table, H
+        )
+        trial_counts.append(count)
+
+        if states[-1].is_solved() and (best is None or not best[0][-1].is_solved() or count < best[1]):
+            best = (states, count, pulls)
+            since_best = 0
+        else:
+            if best is None:
+                best = (states, count, pulls)
+            since_best += 1
+
+        if since_best >= patience or (budget is not None and budget.reason is not None):
+            break
+
+    if table_path is not None:
+        H.save(table_path)
+
+    states, count, pulls = best
+    return states, count, pulls, trial_counts
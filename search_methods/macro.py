@@ -0,0 +1,96 @@
+from collections import deque
+from typing import Iterator, List, Tuple
+
+from sokoban.map import Map
+from sokoban.moves import *
+
+# Macro moves: the player walks inside the region he reaches without touching a box,
+# then pushes or pulls a box. Only box moves branch the search, the walk is attached for replay.
+
+def reachable(s: Map) -> dict:
+    """Flood fills the cells the player reaches without moving a box, maps each one to (previous cell, move)"""
+    move_table = s.level.move_table
+    box_at = s.box_at
+
+    parents = {s.player_cell: (None, None)}
+    queue = deque([s.player_cell])
+
+    while queue:
+        cell = queue.popleft()
+        for move in (LEFT, RIGHT, UP, DOWN):
+            next_cell = move_table[move][cell]
+            if next_cell != -1 and next_cell not in parents and next_cell not in box_at:
+                parents[next_cell] = (cell, move)
+                queue.append(next_cell)
+
+    return parents
+
+def walk_path(parents: dict, cell: int) -> List[int]:
+    """Returns the walking moves leading the player to the cell of the flood fill"""
+    moves = []
+    while parents[cell][0] is not None:
+        cell, move = parents[cell]
+        moves.append(move)
+    return moves[::-1]
+
+def normalized_key(s: Map, parents: dict = None) -> int:
+    """
+    Returns the state key with the player moved to the smallest cell of his region,
+    so the states differing only by a walk inside the region share the same key
+    """
+    if parents is None:
+        parents = reachable(s)
+    return s.key - s.player_cell + min(parents)
+
+def macro_successors(
+        s: Map,
+        prune_dead_squares: bool = False,
+        prune_deadlocks: bool = False,
+        pushes: bool = True,
+        pulls: bool = True
+    ) -> Iterator[Tuple[List[int], Map, int]]:
+    """
+    Yields (moves, s_prime, key) for every box push or pull the player can reach:
+    moves is the walk followed by the BOX_* move, s_prime the resulting state and key its normalized key
+    The pushes or the pulls can be left out
+    """
+    level = s.level
+    move_table = level.move_table
+    parents = reachable(s)
+    box_at = s.box_at
+
+    for box_cell in s.box_cells:
+        for move in (LEFT, RIGHT, UP, DOWN):
+            # Push: the player stands behind the box, the box goes forward
+            stand_cell = move_table[opposite_moves[move]][box_cell]
+            future_cell = move_table[move][box_cell]
+            if pushes and stand_cell in parents and future_cell != -1 and future_cell not in box_at:
+                yield from _box_move(s, parents, stand_cell, move + 4, future_cell, prune_dead_squares, prune_deadlocks)
+
+            # Pull: the player stands in front of the box and walks away from it
+            stand_cell = move_table[move][box_cell]
+            if pulls and stand_cell in parents:
+                future_cell = move_table[move][stand_cell]
+                if future_cell != -1 and future_cell not in box_at:
+                    yield from _box_move(s, parents, stand_cell, move + 4, stand_cell, prune_dead_squares, prune_deadlocks)
+
+def _box_move(s, parents, stand_cell, box_move, box_destination, prune_dead_squares, prune_deadlocks):
+    """Yields the macro move made of the walk to stand_cell and the box move, unless it is pruned"""
+    if prune_dead_squares and s.level.dead_squares[box_destination]:
+        return
+
+    s_prime = s.__class__.from_level(s.level, stand_cell, s.box_cells)
+    token = s_prime.apply_move(box_move)
+
+    if prune_deadlocks and s_prime.is_deadlocked(s_prime.box_cells[token.box_index]):
+        return
+
+    yield walk_path(parents, stand_cell) + [box_move], s_prime, normalized_key(s_prime)
+
+def apply_moves(s: Map, moves: List[int]) -> int:
+    """Applies the moves of a macro move to the state in place, returns the number of pulls"""
+    pulls = 0
+    for move in moves:
+        if s.apply_move(move).pulled:
+            pulls += 1
+    return pulls
@@ -0,0 +1,111 @@
+from typing import List
+
+__all__ = ['Matching']
+
+
+class Matching:
+    """
+    Minimum cost perfect matching between rows (boxes) and columns (targets),
+    solved with the Hungarian algorithm with potentials in O(n^3).
+
+    When the costs of a single row change, update_row repairs the matching with
+    one augmenting phase in O(n^2) instead of solving it again.
+    The cost matrix has to be square, pad it with zero cost rows or columns otherwise.
+
+    Attributes:
+    rows: number of rows
+    columns: number of columns
+    u: potentials of the rows (1-indexed, u[0] unused)
+    v: potentials of the columns (1-indexed, v[0] is the virtual column)
+    p: p[j] is the row matched with column j (1-indexed), 0 if the column is free
+    """
+    def __init__(self, costs: List[List[int]]):
+        self.rows = len(costs)
+        self.columns = len(costs[0]) if self.rows > 0 else 0
+
+        if self.rows != self.columns:
+            raise ValueError('Matching needs a square cost matrix')
+
+        self.u = [0] * (self.rows + 1)
+        self.v = [0] * (self.columns + 1)
+        self.p = [0] * (self.columns + 1)
+
+        for row in range(1, self.rows + 1):
+            self._augment(costs, row)
+
+    def _augment(self, costs: List[List[int]], row: int) -> None:
+        """Matches the free row along the shortest augmenting path, updating the potentials."""
+        u, v, p = self.u, self.v, self.p
+        columns = self.columns
+        inf = float('inf')
+
+        p[0] = row
+        free_column = 0
+        min_v = [inf] * (columns + 1)
+        way = [0] * (columns + 1)
+        used = [False] * (columns + 1)
+
+        while True:
+            used[free_column] = True
+            current_row = p[free_column]
+            row_costs = costs[current_row - 1]
+            delta = inf
+            next_column = 0
+
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    reduced = row_costs[j - 1] - u[current_row] - v[j]
+                    if reduced < min_v[j]:
+                        min_v[j] = reduced
+                        way[j] = free_column
+                    if min_v[j] < delta:
+                        delta = min_v[j]
+                        next_column = j
+
+            for j in range(columns + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_v[j] -= delta
+
+            free_column = next_column
+            if p[free_column] == 0:
+                break
+
+        # Flip the matching along the augmenting path
+        while free_column:
+            previous_column = way[free_column]
+            p[free_column] = p[previous_column]
+            free_column = previous_column
+
+    def update_row(self, costs: List[List[int]], row: int) -> None:
+        """Repairs the matching after the costs of the row (0-indexed) changed."""
+        row += 1
+        for j in range(1, self.columns + 1):
+            if self.p[j] == row:
+                self.p[j] = 0
+
+        self._augment(costs, row)
+
+    def cost(self, costs: List[List[int]]) -> int:
+        """Returns the total cost of the matching."""
+        return sum(costs[self.p[j] - 1][j - 1] for j in range(1, self.columns + 1) if self.p[j])
+
+    def assignment(self) -> List[int]:
+        """Returns the column matched with every row (0-indexed)."""
+        columns = [-1] * self.rows
+        for j in range(1, self.columns + 1):
+            if self.p[j]:
+                columns[self.p[j] - 1] = j - 1
+        return columns
+
+    def copy(self) -> 'Matching':
+        """Returns a copy of the matching, sharing nothing with the original."""
+        new_matching = Matching.__new__(Matching)
+        new_matching.rows = self.rows
+        new_matching.columns = self.columns
+        new_matching.u = self.u.copy()
+        new_matching.v = self.v.copy()
+        new_matching.p = self.p.copy()
+        return new_matching
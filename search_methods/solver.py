@@ -1,11 +1,32 @@
 import time
-from typing import Tuple, List
+import tracemalloc
+from functools import partial
+from typing import Optional
 
 from sokoban.map import Map
-from search_methods.lrta_star import lrta_star
+from search_methods.lrta_star import lrta_star, lrta_star_trials, new_table
 from search_methods.beam_search import beam_search
+from search_methods.astar import astar
+from search_methods.ida_star import ida_star
+from search_methods.bidirectional import bidirectional
 
-from search_methods.heuristics import h3, c3
+from search_methods.heuristics import h3, c3, h4, heuristic_cache
+from search_methods.budget import Budget, SolveResult
+from search_methods.store import SolutionStore
+from search_methods.table import HeuristicTable
+from search_methods.utils import StateDict, state_key
+from search_methods.macro import normalized_key
+
+
+def _label(function: callable) -> str:
+    """Returns a label of the function stable across runs, a partial gives its function and its sorted arguments"""
+    if isinstance(function, partial):
+        arguments = [_label(function.func)] + [repr(arg) for arg in function.args]
+        arguments += [f"{name}={value!r}" for name, value in sorted(function.keywords.items())]
+        return f"{arguments[0]}({', '.join(arguments[1:])})"
+
+    # A callable object has no name, its class stands for it (its repr may hold its address)
+    return getattr(function, '__name__', type(function).__name__)
 
 
 class Solver:
@@ -14,34 +35,187 @@ class Solver:
     def __init__(self, map: Map, algorithm: str) -> None:
         self.algorithm = algorithm
         self.map = map
-        self.h = h3
+        # A* and IDA* are optimal with the admissible h4, h3 adds penalties (corners, revisits) for the local searches
+        self.h = h4 if algorithm in ('astar', 'ida_star') else h3
         self.c = c3
         self.K = 6  # Beam search parameter
+        self.workers = 0  # Beam search parameter: processes expanding each layer, 0 or 1 for serial
+        self.prune_dead_squares = False  # Skip the moves leaving a box on a dead square
+        self.prune_deadlocks = False  # Skip the moves creating a freeze deadlock
+        self.macro_moves = False  # Branch on box pushes and pulls only (not for IDA*)
+        self.tie_breaking = 'high_g'  # A* parameter: None, 'high_g' or 'low_h'
+        self.allow_pulls = False  # Bidirectional parameter: push and pull in both directions
+        self.trials = 1  # LRTA* parameter: trials sharing the learned H (stopped when the path stops improving)
+        self.table_path = None  # LRTA* parameter: file the learned H is loaded from and saved to
+        self.compact_table = False  # LRTA* parameter: store H in a HeuristicTable instead of a StateDict
+        self.max_time = None  # Budget of lrta_star and beam_search: wall-clock seconds
+        self.max_steps = None  # Budget of lrta_star and beam_search: explored states
+        self.max_table_size = None  # Budget of lrta_star and beam_search: entries of H or of the visited set
+        self.store: Optional[SolutionStore] = None  # Cache of solutions and learned LRTA* tables, keyed by level
+        self.track_memory = False  # Measure the peak memory of the search (slows it down)
+        self.stats = {}  # Statistics of the last solve
 
-        if algorithm not in ['lrta_star', 'beam_search']:
+        if algorithm not in ['lrta_star', 'beam_search', 'astar', 'ida_star', 'bidirectional']:
             raise ValueError(f"Unknown algorithm: {algorithm}")
 
-    def solve(self, display = False) -> Tuple[List[Map], int, float, int]:
-        """Solves the map using the selected algorithm."""
-        start_time = time.time()
+    def config(self) -> str:
+        """Returns the label of the algorithm and of the parameters that change its result, the key of the store"""
+        label = f"{self.algorithm} {_label(self.h)}"
+        if self.algorithm in ('lrta_star', 'beam_search'):
+            label += f"/{_label(self.c)}"
+        if self.algorithm == 'beam_search':
+            label += f" K={self.K}"
+        if self.algorithm == 'astar':
+            label += f" tie_breaking={self.tie_breaking}"
+        if self.algorithm == 'bidirectional':
+            label += f" allow_pulls={self.allow_pulls}"
+        if self.algorithm == 'lrta_star':
+            label += f" trials={self.trials} compact_table={self.compact_table}"
+        if self.macro_moves:
+            label += " macro_moves"
+        if self.prune_dead_squares:
+            label += " prune_dead_squares"
+        if self.prune_deadlocks:
+            label += " prune_deadlocks"
+        return label
+
+    def solve(
+            self,
+            display = False,
+            max_time: Optional[float] = None,
+            max_steps: Optional[int] = None,
+            max_table_size: Optional[int] = None
+        ) -> SolveResult:
+        """
+        Solves the map using the selected algorithm.
+        The budget arguments override the attributes of the same name, the search stops at the first limit reached.
+        The result unpacks to (states, count, duration, pulls), its finished flag is False if the budget ran out
+        and its best_state is the state with the lowest heuristic value reached under a budget.
+        With a store and no budget, a cached solution of the level for the same config is verified and returned
+        right away (count is the one of the search that found it). LRTA* starts from the table H learned by
+        the previous solves of the level unless table_path is set.
+        """
+        max_time = self.max_time if max_time is None else max_time
+        max_steps = self.max_steps if max_steps is None else max_steps
+        max_table_size = self.max_table_size if max_table_size is None else max_table_size
+
+        budget = None
+        if (max_time, max_steps, max_table_size) != (None, None, None):
+            if self.algorithm not in ('lrta_star', 'beam_search'):
+                raise ValueError(f"Budgets are not supported by {self.algorithm}")
+            budget = Budget(max_time, max_steps, max_table_size)
+
+        config = self.config() if self.store is not None else None
+        if config is not None and budget is None:
+            start_time = time.time()
+            cached = self.store.get_solution(self.map, config)
+            if cached is not None:
+                states, count, pulls = cached
+                duration = time.time() - start_time
+                self.stats = {'expansions_per_second': None, 'peak_memory': None, 'trial_counts': None, 'total_count': 0, 'cache': 'hit'}
+
+                if display:
+                    print(f"Algorithm: {self.algorithm}")
+                    print(f"Cached solution: {len(states) - 1} moves, {pulls} pulls ({self.store})")
+                return SolveResult(states, count, duration, pulls)
 
         if self.algorithm == 'beam_search':
             fun = beam_search
             args = (self.K, self.h, self.c)
+        elif self.algorithm == 'astar':
+            fun = astar
+            args = (self.h, self.tie_breaking)
+        elif self.algorithm == 'ida_star':
+            fun = ida_star
+            args = (self.h,)
+        elif self.algorithm == 'bidirectional':
+            fun = bidirectional
+            args = (self.allow_pulls,)
+        elif self.trials > 1 or self.table_path is not None:
+            fun = lrta_star_trials
+            args = (self.h, self.c, self.trials, self.table_path)
         else:
             fun = lrta_star
             args = (self.h, self.c)
 
-        states, count, pulls = fun(self.map.copy(), *args)
+        if self.track_memory:
+            tracemalloc.start()
+
+        start_time = time.time()
+        kwargs = {'prune_dead_squares': self.prune_dead_squares, 'prune_deadlocks': self.prune_deadlocks}
+        if self.macro_moves and self.algorithm != 'bidirectional':
+            # The bidirectional search always branches on box moves
+            if self.algorithm == 'ida_star':
+                raise ValueError("Macro moves are not supported by ida_star")
+            kwargs['macro_moves'] = True
+
+        if self.algorithm == 'beam_search' and self.workers > 1:
+            kwargs['workers'] = self.workers
+
+        if self.algorithm == 'lrta_star' and self.compact_table:
+            kwargs['compact_table'] = True
+
+        if budget is not None:
+            kwargs['budget'] = budget
+            budget.start()
+
+        H = None
+        if config is not None and self.algorithm == 'lrta_star' and self.table_path is None:
+            function = normalized_key if self.macro_moves else state_key
+            table_class = HeuristicTable if self.compact_table else StateDict
+            H = self.store.get_table(self.map, config, table_class, function)
+            kwargs['H'] = H if H is not None else new_table(self.macro_moves, self.compact_table)
+
+        if fun is lrta_star_trials:
+            states, count, pulls, trial_counts = fun(self.map.copy(), *args, **kwargs)
+        else:
+            states, count, pulls = fun(self.map.copy(), *args, **kwargs)
+            trial_counts = None
         end_time = time.time()
 
         duration = end_time - start_time
 
+        # The steps of every trial, count only holds the ones of the returned path
+        total_count = sum(trial_counts) if trial_counts is not None else count
+
+        self.stats = {
+            'expansions_per_second': total_count / duration if duration > 0 else float('inf'),
+            'peak_memory': None,
+            'trial_counts': trial_counts,
+            'total_count': total_count,
+            'cache': None,
+        }
+
+        if config is not None:
+            if 'H' in kwargs:
+                self.store.put_table(self.map, config, kwargs['H'])
+                self.stats['warm_table'] = H is not None
+            if budget is None:
+                self.stats['cache'] = 'miss'
+                self.store.put_solution(self.map, config, states, count, pulls)
+
+        if self.track_memory:
+            self.stats['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
         if display:
             print(f"Algorithm: {self.algorithm}")
             print(f"States explored: {count}")
             print(f"Duration: {duration:.4f} seconds")
             print(f"Pulls: {pulls}")
             print(f"Solution found: {states[-1].is_solved()}")
+            print(f"Expansions per second: {self.stats['expansions_per_second']:.0f}")
+            if self.stats['peak_memory'] is not None:
+                print(f"Peak memory: {self.stats['peak_memory'] / 2 ** 20:.2f} MiB")
+            print(f"Heuristic cache: {heuristic_cache}")
+            if self.store is not None:
+                print(f"Solution store: {self.store}")
+            if trial_counts is not None:
+                print(f"Steps per trial: {trial_counts} ({self.stats['total_count']} in total)")
+            if budget is not None and budget.reason is not None:
+                print(f"Stopped by the {budget.reason} budget, best heuristic value: {budget.best_h}")
+
+        if budget is None:
+            return SolveResult(states, count, duration, pulls)
 
-        return states, count, duration, pulls
+        return SolveResult(states, count, duration, pulls, budget.reason is None, budget.reason, budget.best_state)
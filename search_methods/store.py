@@ -0,0 +1,172 @@
+import hashlib
+import json
+import sqlite3
+from typing import Optional, Tuple
+
+from sokoban.map import Map
+
+from search_methods.trace import SolutionTrace
+
+__all__ = ['SolutionStore', 'level_fingerprint']
+
+
+def level_fingerprint(s: Map) -> str:
+    """
+    Returns a content hash of the level and its start state: dimensions, walls, targets, box cells and player cell.
+    The names of the boxes are left out, a solution replays the same whatever they are called.
+    """
+    level = s.level
+    content = {
+        'size': [level.length, level.width],
+        'walls': [cell for cell in range(level.size) if level.walls[cell]],
+        'targets': sorted(level.target_cells),
+        'boxes': sorted(s.box_cells),
+        'player': s.player_cell,
+    }
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+class SolutionStore:
+    """
+    On-disk cache of solutions and learned LRTA* tables in a SQLite file, keyed by the fingerprint of the level.
+
+    A solution is stored per configuration of the solver (algorithm, heuristic and parameters), as its moves,
+    or as its final state for the searches that only return it (beam search). A cached move list is verified by
+    replaying it from the start state before being returned, a broken one is dropped and counts as a miss.
+    A cached final state has no path to replay: it is only checked to be a solved state of the level
+    (as many boxes, on free and distinct cells, the player on another one), its reachability from the start
+    state and its count are trusted as stored.
+    The distance tables of the levels are not stored: rebuilding them takes under a millisecond.
+
+    Attributes:
+    path: path of the SQLite file
+    hits: number of lookups answered from the store
+    misses: number of lookups that were not
+    """
+    def __init__(self, path: str = 'solutions.sqlite'):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS solutions ('
+                'fingerprint TEXT, config TEXT, kind TEXT, data BLOB, count INTEGER, pulls INTEGER, '
+                'PRIMARY KEY (fingerprint, config))'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS tables ('
+                'fingerprint TEXT, config TEXT, data BLOB, PRIMARY KEY (fingerprint, config))'
+            )
+
+    def get_solution(self, s: Map, config: str) -> Optional[Tuple[list, int, int]]:
+        """Returns the verified (states, count, pulls) stored for the level and the configuration, None on a miss"""
+        fingerprint = level_fingerprint(s)
+        row = self.connection.execute(
+            'SELECT kind, data, count, pulls FROM solutions WHERE fingerprint = ? AND config = ?',
+            (fingerprint, config)
+        ).fetchone()
+
+        states = self._verified_states(s, *row[:2]) if row is not None else None
+        if states is None:
+            if row is not None:
+                with self.connection:
+                    self.connection.execute(
+                        'DELETE FROM solutions WHERE fingerprint = ? AND config = ?', (fingerprint, config)
+                    )
+
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return states, row[2], row[3]
+
+    def _verified_states(self, s: Map, kind: str, data: bytes) -> Optional[list]:
+        """Rebuilds the stored solution from the start state, None if it does not solve the level"""
+        try:
+            if kind == 'moves':
+                states = SolutionTrace(s, data)
+            else:
+                player_cell, box_cells = json.loads(data)
+                cells = [player_cell] + box_cells
+                if len(box_cells) != len(s.box_cells) or len(set(cells)) != len(cells):
+                    return None
+                if any(not 0 <= cell < s.level.size or s.level.walls[cell] for cell in cells):
+                    return None
+
+                states = [s.__class__.from_level(s.level, player_cell, box_cells)]
+
+            if states[-1].is_solved():
+                return states
+        except (ValueError, IndexError, TypeError):
+            # An invalid move or a state outside of the level
+            pass
+
+        return None
+
+    def put_solution(self, s: Map, config: str, states, count: int, pulls: int) -> None:
+        """Stores the solution of the level found with the configuration (only if it solves it)"""
+        if not states[-1].is_solved():
+            return
+
+        if isinstance(states, SolutionTrace):
+            kind, data = 'moves', states.moves.tobytes()
+        else:
+            final = states[-1]
+            kind, data = 'state', json.dumps([final.player_cell, list(final.box_cells)]).encode()
+
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)',
+                (level_fingerprint(s), config, kind, data, count, pulls)
+            )
+
+    def get_table(self, s: Map, config: str, table_class: type, function: callable):
+        """Returns the learned table stored for the level and the configuration, None if there is none"""
+        row = self.connection.execute(
+            'SELECT data FROM tables WHERE fingerprint = ? AND config = ?', (level_fingerprint(s), config)
+        ).fetchone()
+
+        if row is None:
+            return None
+        return table_class.from_bytes(row[0], function)
+
+    def put_table(self, s: Map, config: str, table) -> None:
+        """Stores the learned table of the level"""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO tables VALUES (?, ?, ?)', (level_fingerprint(s), config, table.to_bytes())
+            )
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counters"""
+        with self.connection:
+            self.connection.execute('DELETE FROM solutions')
+            self.connection.execute('DELETE FROM tables')
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @property
+    def hit_rate(self) -> float:
+        """Returns the fraction of lookups answered from the store"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Returns the counters of the store"""
+        solutions = self.connection.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+        tables = self.connection.execute('SELECT COUNT(*) FROM tables').fetchone()[0]
+        return {
+            'solutions': solutions,
+            'tables': tables,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
+
+    def __str__(self):
+        return f"SolutionStore({self.path}, {self.hits} hits, {self.misses} misses)"
@@ -0,0 +1,178 @@
+import json
+from array import array
+
+__all__ = ['HeuristicTable', 'fingerprint']
+
+_MASK = (1 << 64) - 1
+
+
+def fingerprint(key: int) -> int:
+    """
+    Mixes a state key of any length into a non-zero 64-bit integer,
+    one multiply-xorshift round per 64-bit chunk and a final avalanche
+    """
+    h = 0x9E3779B97F4A7C15
+    while key:
+        h ^= key & _MASK
+        h = (h * 0xBF58476D1CE4E5B9) & _MASK
+        h ^= h >> 31
+        key >>= 64
+
+    h = (h * 0x94D049BB133111EB) & _MASK
+    h ^= h >> 29
+    return h or 1
+
+
+class HeuristicTable:
+    """
+    Open addressing table for the LRTA* heuristic H, a drop-in replacement of StateDict.
+
+    A state is indexed by the 64-bit fingerprint of function(state) (e.g. the state key). The fingerprints
+    live in an array('Q') probed linearly, 0 marks a free slot, and the values in an array('d') next to it,
+    so an entry costs 16 bytes per slot instead of a dict slot holding a Python int key and value.
+    Two states share an entry only if their fingerprints collide, about n^2 / 2^65 for n entries.
+    Like StateDict, a stored value of 0 counts as missing for `in`, get and get_or_insert.
+
+    Attributes:
+    function: maps a state to its key
+    capacity: number of slots, a power of 2 doubled when the load factor goes over max_load
+    max_load: highest load factor before growing
+    """
+    def __init__(self, function: callable, capacity: int = 1024, max_load: float = 0.75):
+        self.function = function
+        self.max_load = max_load
+        self.capacity = 1 << max(capacity - 1, 1).bit_length()
+        self._keys = array('Q', bytes(8 * self.capacity))
+        self._values = array('d', bytes(8 * self.capacity))
+        self._size = 0
+
+    def _slot(self, key: int) -> int:
+        """Returns the slot holding the fingerprint, or the free slot where it would go"""
+        keys = self._keys
+        mask = self.capacity - 1
+        slot = key & mask
+
+        while True:
+            stored = keys[slot]
+            if stored == key or stored == 0:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _insert(self, slot: int, key: int, value: float) -> None:
+        if self._keys[slot] == 0:
+            self._keys[slot] = key
+            self._size += 1
+
+        self._values[slot] = value
+
+        if self._size > self.max_load * self.capacity:
+            self._grow()
+
+    def _grow(self) -> None:
+        """Doubles the capacity and reinserts the entries"""
+        keys, values = self._keys, self._values
+
+        self.capacity *= 2
+        self._keys = array('Q', bytes(8 * self.capacity))
+        self._values = array('d', bytes(8 * self.capacity))
+
+        for key, value in zip(keys, values):
+            if key:
+                slot = self._slot(key)
+                self._keys[slot] = key
+                self._values[slot] = value
+
+    def get(self, state) -> float:
+        """Returns the value of the state, 0 if it is missing"""
+        key = fingerprint(self.function(state))
+        slot = self._slot(key)
+        return self._values[slot] if self._keys[slot] == key else 0
+
+    def get_or_insert(self, state, compute: callable) -> float:
+        """Returns the value of the state, storing compute() first if it is missing (one probe sequence)"""
+        key = fingerprint(self.function(state))
+        slot = self._slot(key)
+
+        if self._keys[slot] == key and self._values[slot] != 0:
+            return self._values[slot]
+
+        value = compute()
+        self._insert(slot, key, value)
+        return value
+
+    def __getitem__(self, state) -> float:
+        return self.get(state)
+
+    def __setitem__(self, state, value) -> None:
+        key = fingerprint(self.function(state))
+        self._insert(self._slot(key), key, value)
+
+    def __contains__(self, state) -> bool:
+        return self.get(state) != 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        """Iterates over the fingerprints of the stored states"""
+        return (key for key in self._keys if key)
+
+    @property
+    def load_factor(self) -> float:
+        """Returns the fraction of the slots in use"""
+        return self._size / self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the size of the key and value buffers in bytes"""
+        return self._keys.itemsize * len(self._keys) + self._values.itemsize * len(self._values)
+
+    def stats(self) -> dict:
+        """Returns the size and the occupation of the table"""
+        return {
+            'size': self._size,
+            'capacity': self.capacity,
+            'load_factor': self.load_factor,
+            'nbytes': self.nbytes,
+            'bytes_per_entry': self.nbytes / self._size if self._size else 0.0,
+        }
+
+    def to_bytes(self) -> bytes:
+        """Returns a JSON header line followed by the key and value buffers (native byte order)"""
+        header = {
+            'function': self.function.__name__,
+            'capacity': self.capacity,
+            'size': self._size,
+            'max_load': self.max_load,
+        }
+        return json.dumps(header).encode() + b'\n' + self._keys.tobytes() + self._values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, function: callable) -> 'HeuristicTable':
+        """Rebuilds a table from to_bytes, the key function has to be the one it was saved with"""
+        header_end = data.index(b'\n') + 1
+        header = json.loads(data[:header_end])
+
+        if header['function'] != function.__name__:
+            raise ValueError(f"The table was saved with the key function {header['function']}, not {function.__name__}")
+
+        table = cls(function, header['capacity'], header['max_load'])
+        values_start = header_end + 8 * header['capacity']
+        table._keys = array('Q', data[header_end:values_start])
+        table._values = array('d', data[values_start:])
+        table._size = header['size']
+        return table
+
+    def save(self, path: str) -> None:
+        """Writes the table to a binary file"""
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str, function: callable) -> 'HeuristicTable':
+        """Reads a table written by save"""
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read(), function)
+
+    def __str__(self):
+        return f"HeuristicTable({self._size}/{self.capacity} slots, load factor {self.load_factor:.2f})"
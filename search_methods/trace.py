@@ -0,0 +1,110 @@
+from array import array
+from collections.abc import Sequence
+from typing import Iterator
+
+from sokoban.map import Map
+
+__all__ = ['SolutionTrace']
+
+
+class SolutionTrace(Sequence):
+    """
+    Path of a solution stored as the start state and the codes of the moves (one byte each),
+    the states are rebuilt by replaying the moves when they are read
+
+    Behaves like the list of states it replaces: len, indexing (states[-1]), slicing and iteration,
+    every state read is a fresh copy. The last state is cached, so states[-1] replays at most once.
+
+    Attributes:
+    start: copy of the start state
+    moves: array('b') with the moves from the start state
+    pulls: number of pulls of the path (replays the moves once)
+    """
+    def __init__(self, start: Map, moves=()):
+        self.start = start.copy()
+        self.moves = array('b', moves)
+        self._end = None
+        self._pulls = None
+
+    def append(self, move: int) -> None:
+        """Adds a move at the end of the path"""
+        self.moves.append(move)
+        self._end = None
+        self._pulls = None
+
+    def extend(self, moves) -> None:
+        """Adds the moves at the end of the path"""
+        self.moves.extend(moves)
+        self._end = None
+        self._pulls = None
+
+    def finish(self, s: Map, pulls: int) -> None:
+        """Caches a copy of s as the last state of the path and its number of pulls, s has to be the result of the moves"""
+        self._end = s.copy()
+        self._pulls = pulls
+
+    def replay(self) -> Iterator[Map]:
+        """Yields the states of the path lazily, from the start state to the last one"""
+        s = self.start.copy()
+        yield s.copy()
+
+        for move in self.moves:
+            s.apply_move(move)
+            yield s.copy()
+
+    def _last(self) -> Map:
+        if self._end is None or self._pulls is None:
+            s = self.start.copy()
+            pulls = 0
+            for move in self.moves:
+                if s.apply_move(move).pulled:
+                    pulls += 1
+
+            self._end = s
+            self._pulls = pulls
+
+        return self._end
+
+    @property
+    def pulls(self) -> int:
+        self._last()
+        return self._pulls
+
+    def __len__(self) -> int:
+        return len(self.moves) + 1
+
+    def __iter__(self) -> Iterator[Map]:
+        return self.replay()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            if not indices:
+                return []
+
+            wanted = set(indices)
+            states = {}
+            for i, s in enumerate(self.replay()):
+                if i in wanted:
+                    states[i] = s
+                if i >= max(indices):
+                    break
+
+            return [states[i] for i in indices]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('SolutionTrace index out of range')
+
+        if index == len(self.moves):
+            return self._last().copy()
+
+        s = self.start.copy()
+        for move in self.moves[:index]:
+            s.apply_move(move)
+
+        return s
+
+    def __repr__(self):
+        return f"SolutionTrace({len(self.moves)} moves from {self.start.test_name})"
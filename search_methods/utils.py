@@ -1,3 +1,4 @@
+import json
 from typing import Tuple
 from collections import defaultdict
 
@@ -22,7 +23,20 @@ class StateDict:
         self.state[self.function(key)] = value
 
     def __contains__(self, key):
-        return self.function(key) in self.state and self.state[self.function(key)] != 0
+        return self.state.get(self.function(key), 0) != 0
+
+    def get(self, key):
+        """Returns the value of the state, 0 if it is missing, without inserting it"""
+        return self.state.get(self.function(key), 0)
+
+    def get_or_insert(self, key, compute: callable):
+        """Returns the value of the state, storing compute() first if it is missing (or 0)"""
+        index = self.function(key)
+        value = self.state.get(index, 0)
+        if value == 0:
+            value = compute()
+            self.state[index] = value
+        return value
 
     def __delitem__(self, key):
         del self.state[self.function(key)]
@@ -36,6 +50,38 @@ class StateDict:
     def __str__(self):
         return str(self.state)
 
+    def to_bytes(self) -> bytes:
+        """Returns the entries as JSON, with the name of the key function"""
+        entries = [[key, value] for key, value in self.state.items() if value != 0]
+        return json.dumps({'function': self.function.__name__, 'entries': entries}).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, function: callable) -> 'StateDict':
+        """Rebuilds a table from to_bytes, the key function has to be the one it was saved with"""
+        data = json.loads(data)
+
+        if data['function'] != function.__name__:
+            raise ValueError(f"The table was saved with the key function {data['function']}, not {function.__name__}")
+
+        table = cls(function)
+        table.state.update((key, value) for key, value in data['entries'])
+        return table
+
+    def save(self, path: str) -> None:
+        """Writes the table to a JSON file"""
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str, function: callable) -> 'StateDict':
+        """Reads a table written by save"""
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read(), function)
+
+
+def state_key(s: Map) -> int:
+    """Returns the compact key of the state, used to index the StateDict"""
+    return s.key
 
 def get_boxes_and_goals(s: Map):
     """Returns a list of boxes and a list of goals not yet satisfied"""
@@ -108,6 +154,18 @@ def box_reached_goal(s: Map, s_prime: Map) -> bool:
         return True
     return False
 
+def possible_moves(s: Map, prune_dead_squares: bool = False) -> list:
+    """
+    Returns the possible moves of the state, without the ones leaving a box on a dead square if asked.
+    Falls back to all the moves when every move would be pruned, so an agent never gets stuck.
+    """
+    if prune_dead_squares:
+        moves = s.filter_possible_moves(prune_dead_squares=True)
+        if moves:
+            return moves
+
+    return s.filter_possible_moves()
+
 def result(s: Map, a: str):
     """Returns the result of executing action a in state s."""
     s_prime = s.copy()
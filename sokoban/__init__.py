@@ -1,7 +1,11 @@
 from .dummy import Dummy
 from .box import Box
 from .player import Player
+from .level import Level
 from .map import Map
+from .array_map import ArrayMap, MAP_BACKENDS
+from .pack import LevelPack, write_pack, pack_yaml, pack_str
+from .xsb import read_xsb, parse_xsb, to_xsb, write_xsb
 from .moves import (
     LEFT, 
     RIGHT, 
@@ -0,0 +1,177 @@
+from .map import Map, OBSTACLE_SYMBOL, BOX_SYMBOL, TARGET_SYMBOL
+from .moves import *
+
+
+__all__ = ['ArrayMap', 'MAP_BACKENDS']
+
+
+class ArrayMap(Map):
+    '''
+    ArrayMap Class is a Map backend that keeps the board in flat arrays
+    the static cells come from the flat bytearrays of the level and the box occupancy is a bitset,
+    so occupancy checks, is_solved and the state key are bit operations instead of dictionary lookups and list scans
+
+    Attributes:
+    box_bits: bitset of the cells holding a box (bit cell is set if there is a box on cell)
+    '''
+    def _set_state(self, level, player_cell, box_cells, explored_states=0, undo_moves=0, key=None, boxes_on_targets=None, box_at=None, box_bits=None):
+        super()._set_state(level, player_cell, box_cells, explored_states, undo_moves, key, boxes_on_targets, box_at)
+
+        if box_bits is None:
+            box_bits = 0
+            for box_cell in box_cells:
+                box_bits |= 1 << box_cell
+
+        self.box_bits = box_bits
+
+    def cells(self):
+        ''' Returns the board as a flat bytearray of symbols, indexed by cell'''
+        cells = bytearray(self.level.size)
+
+        for cell in range(self.level.size):
+            if self.level.walls[cell]:
+                cells[cell] = OBSTACLE_SYMBOL
+            elif self.box_bits >> cell & 1:
+                cells[cell] = BOX_SYMBOL
+            elif cell in self.level.target_cells:
+                cells[cell] = TARGET_SYMBOL
+
+        return cells
+
+    @property
+    def map(self):
+        ''' Returns the 2D matrix representing the map'''
+        cells = self.cells()
+        return [list(cells[x * self.width:(x + 1) * self.width]) for x in range(self.length)]
+
+    def _cell_free(self, cell):
+        ''' Checks if the cell taken from a move table is reachable and holds no box'''
+        return cell != -1 and not self.box_bits >> cell & 1
+
+    def player_valid_move(self, move):
+        ''' Checks if the player moves outside the map / hits an obstacle'''
+        move_table = self.level.move_table[move]
+        future_cell = move_table[self.player_cell]
+
+        if future_cell == -1:
+            return False
+
+        # The player pushes the box in front of him
+        if self.box_bits >> future_cell & 1:
+            return self._cell_free(move_table[future_cell])
+
+        return True
+
+    def box_valid_move(self, move):
+        ''' Checks player moves with the box, pushing the box in front or pulling the box behind'''
+        implicit_move = move - 4
+
+        if self.player_valid_move(implicit_move):
+            if self.box_bits >> self.level.move_table[implicit_move][self.player_cell] & 1:
+                return True
+
+            opposite_cell = self.level.move_table[opposite_moves[implicit_move]][self.player_cell]
+            return opposite_cell != -1 and bool(self.box_bits >> opposite_cell & 1)
+
+        return False
+
+    def apply_move(self, move):
+        '''
+        Applies the move to the map
+        Returns an UndoToken that can be given to undo_move to restore the previous state
+        '''
+        token = super().apply_move(move)
+
+        if token.box_index != -1:
+            self.box_bits ^= (1 << token.box_cell) | (1 << self.box_cells[token.box_index])
+
+        return token
+
+    def undo_move(self, token):
+        ''' Restores the state from before the move that returned the token'''
+        if token.box_index != -1:
+            self.box_bits ^= (1 << token.box_cell) | (1 << self.box_cells[token.box_index])
+
+        super().undo_move(token)
+
+    def is_solved(self):
+        ''' Checks if all the boxes are on the targets'''
+        return self.box_bits & self.level.target_mask == self.level.target_mask
+
+    def filter_possible_moves(self, prune_dead_squares=False):
+        '''
+        Returns the possible moves the player can make, looked up in the move tables of the level
+        With prune_dead_squares, the moves leaving a box on a dead square of the level are dropped
+        '''
+        move_table = self.level.move_table
+        player_cell = self.player_cell
+        box_bits = self.box_bits
+
+        possible_moves = []
+        box_moves = []
+        for move in (LEFT, RIGHT, UP, DOWN):
+            future_cell = move_table[move][player_cell]
+            if future_cell == -1:
+                continue
+
+            if box_bits >> future_cell & 1:
+                # Pushing the box in front, with either the simple or the box move
+                box_future_cell = move_table[move][future_cell]
+                if box_future_cell != -1 and not box_bits >> box_future_cell & 1:
+                    possible_moves.append(move)
+                    box_moves.append(move + 4)
+            else:
+                possible_moves.append(move)
+
+                # Pulling the box behind the player
+                opposite_cell = move_table[opposite_moves[move]][player_cell]
+                if opposite_cell != -1 and box_bits >> opposite_cell & 1:
+                    box_moves.append(move + 4)
+
+        if prune_dead_squares:
+            return [move for move in possible_moves + box_moves if not self.moves_box_to_dead_square(move)]
+
+        return possible_moves + box_moves
+
+    def copy(self):
+        ''' Returns a copy of the current state, sharing the same level'''
+        new_map = self.__class__.__new__(self.__class__)
+        new_map._set_state(
+            self.level,
+            self.player_cell,
+            self.box_cells.copy(),
+            self.explored_states,
+            self.undo_moves,
+            self._key,
+            self.boxes_on_targets,
+            self.box_at.copy(),
+            self.box_bits
+        )
+        return new_map
+
+    @property
+    def key(self) -> int:
+        ''' Returns the canonical key of the state: key = box_bits * (length * width) + player_cell'''
+        return self.box_bits * self.level.size + self.player_cell
+
+    def __str__(self):
+        ''' Overriding toString method for ArrayMap class'''
+        symbols = {0: '_', OBSTACLE_SYMBOL: '/', BOX_SYMBOL: 'B', TARGET_SYMBOL: 'X'}
+        cells = self.cells()
+
+        rows = []
+        for x in range(self.length):
+            row = ''
+            for y in range(self.width):
+                cell = x * self.width + y
+                row += 'P ' if cell == self.player_cell else f"{symbols[cells[cell]]} "
+            rows.append(row)
+
+        return '\n'.join([''] + rows[::-1])
+
+
+# Board backends that can be selected for a run, all of them load and behave the same way
+MAP_BACKENDS = {
+    'list': Map,
+    'array': ArrayMap,
+}
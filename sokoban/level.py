@@ -0,0 +1,189 @@
+from .moves import *
+
+from collections import deque
+
+
+__all__ = ['Level']
+
+
+class Level:
+    '''
+    Level Class records the static part of the board, shared by every state of a search
+    the dimensions, the obstacles, the targets and the names of the boxes never change while solving
+
+    Cells are indexed in row-major order: cell = x * width + y
+
+    Attributes:
+    length: length of the map
+    width: width of the map
+    size: number of cells of the map
+    unreachable: push distance given to the cells from which a box can't reach a target (longer than any push path)
+    obstacles: list of obstacles given as tuples for positions on the map
+    targets: list of targets given as tuples for positions on the map
+    box_names: names of the boxes, in the order their positions are stored in a state
+    test_name: name of the level
+    walls: flat bytearray, 1 for the cells holding an obstacle
+    target_cells: set of the cells holding a target
+    target_mask: bitset of the cells holding a target
+    move_table: move_table[move][cell] is the cell reached from cell with the walking move,
+                or -1 if it is an obstacle or it falls off the map
+    dead_squares: flat bytearray, 1 for the cells from which a box can never reach a target with pushes or pulls
+                  (all 0 with more boxes than targets, a box may then stay anywhere)
+    corners: flat bytearray, 1 for the cells with an obstacle or a border on two perpendicular sides
+    target_distances: per metric ('manhattan', 'push' or 'move'), one tuple per target (in the order of targets)
+                      with the distance from every cell to that target
+    nearest_target_distance: per metric, tuple with the distance from every cell to its nearest target
+    '''
+    def __init__(self, length, width, targets, obstacles, box_names, test_name='test'):
+        self.length = length
+        self.width = width
+        self.size = length * width
+        self.unreachable = self.size
+        self.obstacles = [tuple(obstacle) for obstacle in obstacles]
+        self.targets = [tuple(target) for target in targets]
+        self.box_names = tuple(box_names)
+        self.test_name = test_name
+
+        self.walls = bytearray(self.size)
+        for obstacle_x, obstacle_y in self.obstacles:
+            self.walls[self.cell(obstacle_x, obstacle_y)] = 1
+
+        self.ordered_target_cells = tuple(self.cell(target_x, target_y) for target_x, target_y in self.targets)
+        self.target_cells = frozenset(self.ordered_target_cells)
+
+        self.target_mask = 0
+        for target_cell in self.target_cells:
+            self.target_mask |= 1 << target_cell
+
+        # Built once per level, indexed by the move constants (index 0 is unused)
+        self.move_table = [()] + [self._build_move_table(move) for move in (LEFT, RIGHT, UP, DOWN)]
+
+        self.corners = bytearray(self._is_corner(cell) for cell in range(self.size))
+
+        # Distance tables read by the heuristics, built once at load time
+        self.target_distances = {
+            'manhattan': [self._build_manhattan_distances(target_cell) for target_cell in self.ordered_target_cells],
+            'push': [self._build_push_distances(target_cell) for target_cell in self.ordered_target_cells],
+            'move': [self._build_move_distances(target_cell) for target_cell in self.ordered_target_cells],
+        }
+        self.nearest_target_distance = {
+            metric: tuple(min(column) for column in zip(*distances)) if distances else (0,) * self.size
+            for metric, distances in self.target_distances.items()
+        }
+
+        # Sound for pruning: the 'move' distances ignore the other boxes, so a box left on a dead square
+        # can't reach any target with any sequence of pushes and pulls
+        every_box_on_a_target = len(self.box_names) <= len(self.ordered_target_cells)
+        self.dead_squares = bytearray(
+            1 if every_box_on_a_target and not self.walls[cell]
+            and self.nearest_target_distance['move'][cell] == self.unreachable else 0
+            for cell in range(self.size)
+        )
+
+    def cell(self, x, y):
+        ''' Returns the index of the cell at position (x, y)'''
+        return x * self.width + y
+
+    def position(self, cell):
+        ''' Returns the (x, y) position of the cell'''
+        return divmod(cell, self.width)
+
+    def is_wall(self, x, y):
+        ''' Checks if the position holds an obstacle or falls off the map (the border counts as a wall)'''
+        return not (0 <= x < self.length and 0 <= y < self.width) or self.walls[x * self.width + y] == 1
+
+    def manhattan(self, cell_a, cell_b):
+        ''' Returns the manhattan distance between two cells'''
+        x_a, y_a = divmod(cell_a, self.width)
+        x_b, y_b = divmod(cell_b, self.width)
+        return abs(x_a - x_b) + abs(y_a - y_b)
+
+    def neighbour(self, cell, move):
+        ''' Returns the cell reached from cell with the move, or -1 if it falls off the map'''
+        x, y = divmod(cell, self.width)
+
+        if move == LEFT:
+            return cell - 1 if y > 0 else -1
+        elif move == RIGHT:
+            return cell + 1 if y < self.width - 1 else -1
+        elif move == DOWN:
+            return cell - self.width if x > 0 else -1
+        elif move == UP:
+            return cell + self.width if x < self.length - 1 else -1
+        else:
+            raise ValueError('Move doesn\'t exist')
+
+    def _build_move_table(self, move):
+        ''' Returns the cells reached from every cell with the move, -1 for obstacles and borders'''
+        table = []
+        for cell in range(self.size):
+            future_cell = self.neighbour(cell, move)
+            if future_cell != -1 and self.walls[future_cell]:
+                future_cell = -1
+            table.append(future_cell)
+        return tuple(table)
+
+    def _is_corner(self, cell):
+        ''' Checks if the cell has an obstacle or a border both vertically and horizontally'''
+        move_table = self.move_table
+        vertical = move_table[UP][cell] == -1 or move_table[DOWN][cell] == -1
+        horizontal = move_table[LEFT][cell] == -1 or move_table[RIGHT][cell] == -1
+        return 1 if vertical and horizontal else 0
+
+    def _build_manhattan_distances(self, target_cell):
+        ''' Returns the manhattan distance from every cell to the target'''
+        return tuple(self.manhattan(cell, target_cell) for cell in range(self.size))
+
+    def _build_push_distances(self, target_cell):
+        '''
+        Returns the minimum number of pushes to bring a box from every cell to the target
+        found by pulling the box back from the target (breadth first, reverse of the pushes),
+        the cells the box never reaches get the unreachable distance
+        Pulls are legal moves of this game, so this is the distance of a solution made of pushes
+        '''
+        distances = [self.unreachable] * self.size
+        distances[target_cell] = 0
+        queue = deque([target_cell])
+
+        while queue:
+            box_cell = queue.popleft()
+            for move in (LEFT, RIGHT, UP, DOWN):
+                # The box came from previous_cell, pushed by the player standing next to it
+                previous_cell = self.move_table[move][box_cell]
+                if previous_cell == -1 or distances[previous_cell] != self.unreachable:
+                    continue
+
+                if self.move_table[move][previous_cell] != -1:
+                    distances[previous_cell] = distances[box_cell] + 1
+                    queue.append(previous_cell)
+
+        return tuple(distances)
+
+    def _build_move_distances(self, target_cell):
+        '''
+        Returns the minimum number of box moves (pushes or pulls) to bring a box from every cell to the target,
+        the other boxes ignored, the cells the box never reaches get the unreachable distance
+        The box moves between two neighbour cells if the player can stand behind it (push) or in front of it (pull),
+        the same condition both ways, so a breadth first search from the target gives a lower bound of the moves
+        '''
+        distances = [self.unreachable] * self.size
+        distances[target_cell] = 0
+        queue = deque([target_cell])
+
+        while queue:
+            box_cell = queue.popleft()
+            for move in (LEFT, RIGHT, UP, DOWN):
+                next_cell = self.move_table[move][box_cell]
+                if next_cell == -1 or distances[next_cell] != self.unreachable:
+                    continue
+
+                # The player stands beyond next_cell or behind box_cell, on the line of the move
+                if self.move_table[move][next_cell] != -1 or self.move_table[opposite_moves[move]][box_cell] != -1:
+                    distances[next_cell] = distances[box_cell] + 1
+                    queue.append(next_cell)
+
+        return tuple(distances)
+
+    def __str__(self):
+        ''' Overriding toString method for Level class'''
+        return f'Level {self.test_name}: {self.length}x{self.width}, {len(self.box_names)} boxes'
@@ -1,9 +1,10 @@
 from .player import Player
 from .box import Box
+from .level import Level
 from .moves import *
 
 from matplotlib import pyplot as plt
-from typing import Optional
+from typing import Optional, NamedTuple
 import yaml
 import os
 
@@ -13,53 +14,94 @@ BOX_SYMBOL = 2
 TARGET_SYMBOL = 3
 
 
+class UndoToken(NamedTuple):
+    '''
+    Record returned by Map.apply_move, holding what Map.undo_move needs to restore the previous state
+
+    Attributes:
+    player_cell: cell of the player before the move
+    box_index: index of the moved box in level.box_names, -1 if no box was moved
+    box_cell: cell of the moved box before the move
+    pulled: True if the box was pulled (undo move)
+    key: cached key of the state before the move
+    '''
+    player_cell: int
+    box_index: int
+    box_cell: int
+    pulled: bool
+    key: Optional[int]
+
+
 class Map:
     '''
     Map Class records the state of the board
     where the player is, what moves can the player make, where are the boxes and where they have to go, and the obstacles.
 
+    The static part of the board (dimensions, obstacles, targets) lives in a Level shared by all the copies,
+    a state only holds the cell of the player and the cells of the boxes.
+
     Attributes:
+    level: static level the state belongs to
+    player_cell: cell of the player
+    box_cells: list with the cell of each box, in the order of level.box_names
+    box_at: dictionary mapping the cell of each box to its index in box_cells, for constant time occupancy checks
     length: length of the map
     width: width of the map
-    player: player object, positioned on the map
-    boxes: list of box objects, positioned on the map
+    player: player object, positioned on the map (read-only view)
+    boxes: dictionary of box objects, positioned on the map (read-only view)
     obstacles: list of obstacles given as tuples for positions on the map
     targets: list of target objects, positioned on the map
     map: 2D matrix representing the map
+    boxes_on_targets: number of boxes placed on a target, updated on every move
     explored_states: number of explored states
     undo_moves: number of undo moves made // e.g. _ P B => P B _
+    key: compact canonical key of the state (player cell and box cells), cached
     '''
     def __init__(self, length, width, player_x, player_y, boxes, targets, obstacles, test_name='test'):
-        self.length = length
-        self.width = width
-        self.map = [[0 for _ in range(width)] for _ in range(length)]
-        self.obstacles = obstacles
-        self.test_name = test_name
+        level = Level(length, width, targets, obstacles, [box_name for box_name, _, _ in boxes], test_name)
 
-        self.explored_states = 0
-        self.undo_moves = 0
+        self._set_state(
+            level,
+            level.cell(player_x, player_y),
+            [level.cell(box_x, box_y) for _, box_x, box_y in boxes]
+        )
 
-        for obstacle_x, obstacle_y in self.obstacles:
-            self.map[obstacle_x][obstacle_y] = OBSTACLE_SYMBOL
+    def _set_state(self, level, player_cell, box_cells, explored_states=0, undo_moves=0, key=None, boxes_on_targets=None, box_at=None):
+        self.level = level
+        self.player_cell = player_cell
+        self.box_cells = box_cells
 
-        self.player = Player('player', 'P', player_x, player_y)
+        if box_at is None:
+            box_at = {box_cell: box_index for box_index, box_cell in enumerate(box_cells)}
 
-        self.boxes = {}
+        self.box_at = box_at
 
-        # Dictionary internally used with (x, y) as key and box_name as value
-        self.positions_of_boxes = {}
+        if boxes_on_targets is None:
+            boxes_on_targets = sum(1 for box_cell in box_cells if box_cell in level.target_cells)
 
-        for box_name, box_x, box_y in boxes:
-            self.boxes[box_name] = Box(box_name, 'B', box_x, box_y)
+        self.boxes_on_targets = boxes_on_targets
 
-            self.positions_of_boxes[(box_x, box_y)] = box_name
+        self.explored_states = explored_states
+        self.undo_moves = undo_moves
+        self._key = key
 
-            self.map[box_x][box_y] = BOX_SYMBOL
+        # Object views, built on demand and dropped after every move
+        self._player = None
+        self._boxes = None
 
-        self.targets = []
-        for target_x, target_y in targets:
-            self.targets.append((target_x, target_y))
-            self.map[target_x][target_y] = TARGET_SYMBOL
+    @classmethod
+    def from_level(cls, level, player_cell, box_cells):
+        ''' Creates a state of the level from the cell of the player and the cells of the boxes'''
+        new_map = cls.__new__(cls)
+        new_map._set_state(level, player_cell, list(box_cells))
+        return new_map
+
+    @classmethod
+    def from_map(cls, s):
+        ''' Returns the same state of the board in the backend of cls'''
+        new_map = cls.__new__(cls)
+        new_map._set_state(s.level, s.player_cell, s.box_cells.copy(), s.explored_states, s.undo_moves)
+        return new_map
 
     @classmethod
     def from_str(cls, state_str):
@@ -107,64 +149,97 @@ class Map:
             test_name=path.split('/')[-1].split('.')[0]
         )
 
-    def object_in_bounds_move(self, checking_object, move):
-        ''' Checks if the object moves inside the map'''
-        if move == LEFT:
-            if checking_object.y == 0:
-                return False
-        elif move == RIGHT:
-            if checking_object.y == self.width - 1:
-                return False
-        elif move == DOWN:
-            if checking_object.x == 0:
-                return False
-        elif move == UP:
-            if checking_object.x == self.length - 1:
-                return False
-        else:
-            raise ValueError('object_in_bounds_move outside range error')
-
-        return True
+    @property
+    def length(self):
+        return self.level.length
+
+    @property
+    def width(self):
+        return self.level.width
+
+    @property
+    def obstacles(self):
+        return self.level.obstacles
+
+    @property
+    def targets(self):
+        return self.level.targets
+
+    @property
+    def test_name(self):
+        return self.level.test_name
+
+    @property
+    def player(self):
+        ''' Returns the player object, positioned on the map'''
+        if self._player is None:
+            self._player = Player('player', 'P', *self.level.position(self.player_cell))
+        return self._player
+
+    @property
+    def boxes(self):
+        ''' Returns the dictionary of box objects, positioned on the map'''
+        if self._boxes is None:
+            self._boxes = {}
+            for box_name, box_cell in zip(self.level.box_names, self.box_cells):
+                self._boxes[box_name] = Box(box_name, 'B', *self.level.position(box_cell))
+        return self._boxes
+
+    @property
+    def positions_of_boxes(self):
+        ''' Returns a dictionary with (x, y) as key and box_name as value'''
+        return {
+            self.level.position(box_cell): box_name
+            for box_name, box_cell in zip(self.level.box_names, self.box_cells)
+        }
+
+    @property
+    def map(self):
+        ''' Returns the 2D matrix representing the map'''
+        grid = [[0 for _ in range(self.width)] for _ in range(self.length)]
 
-    def object_valid_move(self, checking_object, move):
-        ''' Checks if the object moves outside the map / hits an obstacle or a box'''
+        for obstacle_x, obstacle_y in self.obstacles:
+            grid[obstacle_x][obstacle_y] = OBSTACLE_SYMBOL
 
-        if not self.object_in_bounds_move(checking_object, move):
-            return False
+        for target_x, target_y in self.targets:
+            grid[target_x][target_y] = TARGET_SYMBOL
 
-        future_position = checking_object.get_future_position(move)
+        for box_cell in self.box_cells:
+            box_x, box_y = self.level.position(box_cell)
+            grid[box_x][box_y] = BOX_SYMBOL
 
-        if not future_position:
-            raise ValueError('object_valid_move future position doesn\'t exist')
+        return grid
 
-        x, y = future_position
+    def object_in_bounds_move(self, checking_object, move):
+        ''' Checks if the object moves inside the map'''
+        if move not in (LEFT, RIGHT, UP, DOWN):
+            raise ValueError('object_in_bounds_move outside range error')
 
-        # Future position is outside the map
-        # if x < 0 or x >= self.length or y < 0 or y >= self.width:
-        #     return False
+        return self.level.neighbour(self.level.cell(checking_object.x, checking_object.y), move) != -1
 
-        if self.map[x][y] == OBSTACLE_SYMBOL:
-            return False
+    def _cell_free(self, cell):
+        ''' Checks if the cell taken from a move table is reachable and holds no box'''
+        return cell != -1 and cell not in self.box_at
 
-        if self.map[x][y] == BOX_SYMBOL:
-            return False
+    def object_valid_move(self, checking_object, move):
+        ''' Checks if the object moves outside the map / hits an obstacle or a box'''
+        if move not in (LEFT, RIGHT, UP, DOWN):
+            raise ValueError('object_valid_move future position doesn\'t exist')
 
-        return True
+        cell = self.level.cell(checking_object.x, checking_object.y)
+        return self._cell_free(self.level.move_table[move][cell])
 
     def player_valid_move(self, move):
         ''' Checks if the player moves outside the map / hits an obstacle'''
+        move_table = self.level.move_table[move]
+        future_cell = move_table[self.player_cell]
 
-        if not self.object_in_bounds_move(self.player, move):
+        if future_cell == -1:
             return False
 
-        future_position = self.player.get_future_position(move)
-
-        if self.map[future_position[0]][future_position[1]] == OBSTACLE_SYMBOL:
-            return False
-
-        if future_position in self.positions_of_boxes:
-            box = self.boxes[self.positions_of_boxes[future_position]]
-            return self.object_valid_move(box, move)
+        # The player pushes the box in front of him
+        if future_cell in self.box_at:
+            return self._cell_free(move_table[future_cell])
 
         return True
 
@@ -185,22 +260,14 @@ class Map:
         implicit_move = move - 4
 
         if self.player_valid_move(implicit_move):
-            # Player gets in the position of the box
-            future_position = self.player.get_future_position(implicit_move)
+            # Player gets in the position of the box (already checked by player_valid_move)
+            if self.level.move_table[implicit_move][self.player_cell] in self.box_at:
+                return True
 
             # Or player gets to an empty space and drags the box behind him
-            # Case in which the box is in the opposite position of the player for the move
-
-            straight_move_flag = False
-            if self.map[future_position[0]][future_position[1]] == BOX_SYMBOL:
-                straight_move_flag = self.object_valid_move(self.boxes[self.positions_of_boxes[future_position]], implicit_move)
-
-            opposite_position = self.player.get_opposite_position(implicit_move)
-            if 0 <= opposite_position[0] < self.length and 0 <= opposite_position[1] < self.width:
-                if self.map[opposite_position[0]][opposite_position[1]] == BOX_SYMBOL:
-                    straight_move_flag = (straight_move_flag or self.object_valid_move(self.boxes[self.positions_of_boxes[opposite_position]], implicit_move))
-
-            return straight_move_flag
+            # The box always fits in the position left by the player
+            opposite_cell = self.level.move_table[opposite_moves[implicit_move]][self.player_cell]
+            return opposite_cell != -1 and opposite_cell in self.box_at
 
         return False
 
@@ -216,24 +283,36 @@ class Map:
         else:
             raise ValueError('is_valid_move outside range error')
 
+    def _move_box(self, box_cell, future_cell):
+        ''' Moves the box placed on box_cell to future_cell and returns its index'''
+        box_index = self.box_at.pop(box_cell)
+        self.box_at[future_cell] = box_index
+        self.box_cells[box_index] = future_cell
+
+        target_cells = self.level.target_cells
+        self.boxes_on_targets += (future_cell in target_cells) - (box_cell in target_cells)
+
+        return box_index
+
     def apply_move(self, move):
-        ''' Applies the move to the map'''
+        '''
+        Applies the move to the map
+        Returns an UndoToken that can be given to undo_move to restore the previous state
+        '''
+        player_cell = self.player_cell
+        box_index = -1
+        box_cell = -1
+        pulled = False
 
         if move < BOX_LEFT:
             if self.player_valid_move(move):
-                future_position = self.player.get_future_position(move)
-                if self.map[future_position[0]][future_position[1]] == BOX_SYMBOL:
-                    box = self.boxes[self.positions_of_boxes[future_position]]
-
-                    # Update the position of the box in the dictionary
-                    del self.positions_of_boxes[(box.x, box.y)]
-                    self.map[box.x][box.y] = 0
+                move_table = self.level.move_table[move]
+                future_cell = move_table[self.player_cell]
+                if future_cell in self.box_at:
+                    box_cell = future_cell
+                    box_index = self._move_box(future_cell, move_table[future_cell])
 
-                    box.make_move(move)
-                    self.map[box.x][box.y] = BOX_SYMBOL
-                    self.positions_of_boxes[(box.x, box.y)] = box.name
-
-                self.player.make_move(move)
+                self.player_cell = future_cell
             else:
                 raise ValueError('Apply Error: Got to make an invalid move')
         elif move <= BOX_DOWN:
@@ -242,62 +321,195 @@ class Map:
             implicit_move = move - 4
 
             if self.box_valid_move(move):
-                future_position = self.player.get_future_position(implicit_move)
-                if future_position in self.positions_of_boxes:
-                    box = self.boxes[self.positions_of_boxes[future_position]]
+                move_table = self.level.move_table[implicit_move]
+                future_cell = move_table[self.player_cell]
+                if future_cell in self.box_at:
+                    box_cell = future_cell
+                    box_index = self._move_box(future_cell, move_table[future_cell])
                 else:
-                    opposite_position = self.player.get_opposite_position(implicit_move)
+                    opposite_cell = self.level.move_table[opposite_moves[implicit_move]][self.player_cell]
 
-                    if not opposite_position in self.positions_of_boxes:
+                    if opposite_cell not in self.box_at:
                         raise ValueError('Player has to be next to the box to push it')
 
-                    box = self.boxes[self.positions_of_boxes[opposite_position]]
+                    box_cell = opposite_cell
+                    box_index = self._move_box(opposite_cell, self.player_cell)
+                    pulled = True
                     self.undo_moves += 1
 
-                # Update the position of the box in the dictionary
-                del self.positions_of_boxes[(box.x, box.y)]
-                self.map[box.x][box.y] = 0
-
-                box.make_move(implicit_move)
-                self.map[box.x][box.y] = BOX_SYMBOL
-                self.positions_of_boxes[(box.x, box.y)] = box.name
-
-                self.player.make_move(implicit_move)
+                self.player_cell = future_cell
             else:
                 raise ValueError('Apply Error: Got to make an invalid move')
         else:
             raise ValueError('Apply Error: Got to make an invalid move')
 
+        token = UndoToken(player_cell, box_index, box_cell, pulled, self._key)
+
         self.explored_states += 1
+        self._key = None
+        self._player = None
+        self._boxes = None
 
-        # Regenerate the targets on the map, if the box moved off them
-        for target_x, target_y in self.targets:
-            if (target_x, target_y) not in self.positions_of_boxes:
-                self.map[target_x][target_y] = TARGET_SYMBOL
+        return token
+
+    def undo_move(self, token):
+        ''' Restores the state from before the move that returned the token'''
+        self.player_cell = token.player_cell
+
+        if token.box_index != -1:
+            target_cells = self.level.target_cells
+            box_cell = self.box_cells[token.box_index]
+            self.boxes_on_targets += (token.box_cell in target_cells) - (box_cell in target_cells)
+
+            del self.box_at[box_cell]
+            self.box_at[token.box_cell] = token.box_index
+            self.box_cells[token.box_index] = token.box_cell
+
+        if token.pulled:
+            self.undo_moves -= 1
+
+        self.explored_states -= 1
+        self._key = token.key
+        self._player = None
+        self._boxes = None
+
+    def successors(self, prune_dead_squares=False, prune_deadlocks=False):
+        '''
+        Yields (move, key) for every possible move, without copying the board
+        The move is applied in place while the pair is yielded and undone when the iteration resumes
+        With prune_deadlocks, the moves creating a freeze deadlock are skipped
+        '''
+        for move in self.filter_possible_moves(prune_dead_squares):
+            token = self.apply_move(move)
+            if prune_deadlocks and token.box_index != -1 and self.is_deadlocked(self.box_cells[token.box_index]):
+                self.undo_move(token)
+                continue
+
+            try:
+                yield move, self.key
+            finally:
+                self.undo_move(token)
 
     def is_solved(self):
-        ''' Checks if all the boxes are on the targets'''
-        for target_x, target_y in self.targets:
-            if not (target_x, target_y) in self.positions_of_boxes:
-                return False
+        ''' Checks if all the boxes are on the targets (every target holds a box)'''
+        return self.boxes_on_targets == len(self.level.target_cells)
 
-        return True
+    def filter_possible_moves(self, prune_dead_squares=False):
+        '''
+        Returns the possible moves the player can make, looked up in the move tables of the level
+        With prune_dead_squares, the moves leaving a box on a dead square of the level are dropped
+        '''
+        move_table = self.level.move_table
+        player_cell = self.player_cell
+        box_at = self.box_at
 
-    def filter_possible_moves(self):
-        ''' Returns the possible moves the player can make'''
         possible_moves = []
-        for move in range(LEFT, BOX_DOWN + 1):
-            if self.is_valid_move(move):
+        box_moves = []
+        for move in (LEFT, RIGHT, UP, DOWN):
+            future_cell = move_table[move][player_cell]
+            if future_cell == -1:
+                continue
+
+            if future_cell in box_at:
+                # Pushing the box in front, with either the simple or the box move
+                box_future_cell = move_table[move][future_cell]
+                if box_future_cell != -1 and box_future_cell not in box_at:
+                    possible_moves.append(move)
+                    box_moves.append(move + 4)
+            else:
                 possible_moves.append(move)
-        return possible_moves
+
+                # Pulling the box behind the player
+                if move_table[opposite_moves[move]][player_cell] in box_at:
+                    box_moves.append(move + 4)
+
+        if prune_dead_squares:
+            return [move for move in possible_moves + box_moves if not self.moves_box_to_dead_square(move)]
+
+        return possible_moves + box_moves
+
+    def moves_box_to_dead_square(self, move):
+        ''' Checks if the valid move pushes or pulls a box onto a dead square of the level'''
+        implicit_move = move - 4 if move >= BOX_LEFT else move
+        move_table = self.level.move_table[implicit_move]
+        future_cell = move_table[self.player_cell]
+
+        if future_cell in self.box_at:
+            return self.level.dead_squares[move_table[future_cell]] == 1
+
+        # The box behind the player takes his place
+        if move >= BOX_LEFT:
+            return self.level.dead_squares[self.player_cell] == 1
+
+        return False
+
+    def _solid(self, cell, walls, box_cell):
+        ''' Checks if cell (taken from a move table) is an obstacle, a box in walls or a box frozen with box_cell in walls'''
+        if cell == -1 or cell in walls:
+            return True
+
+        return cell in self.box_at and self._frozen(cell, walls | {box_cell})
+
+    def _blocked(self, cell, axis, walls):
+        '''
+        Checks if a box on cell can be neither pushed nor pulled along the axis (LEFT/RIGHT or UP/DOWN),
+        boxes in walls are treated as obstacles
+        The box can go to a side cell that is free and not a dead square, pushed by the player standing on the
+        other side or pulled by the player stepping from the side cell to the one beyond it
+        '''
+        move_table = self.level.move_table
+        dead_squares = self.level.dead_squares
+
+        for towards, behind in (axis, axis[::-1]):
+            side_cell = move_table[towards][cell]
+            if side_cell == -1 or dead_squares[side_cell] or self._solid(side_cell, walls, cell):
+                continue
+
+            # Pushed from behind, or pulled from the side cell
+            if not self._solid(move_table[behind][cell], walls, cell):
+                return False
+            if not self._solid(move_table[towards][side_cell], walls, cell):
+                return False
+
+        return True
+
+    def _frozen(self, cell, walls):
+        ''' Checks if the box on cell can't be moved along any axis'''
+        return self._blocked(cell, (LEFT, RIGHT), walls) and self._blocked(cell, (UP, DOWN), walls)
+
+    def is_deadlocked(self, box_cell):
+        '''
+        Checks if the box that just moved to box_cell created a deadlock:
+        the box or one of its neighbours frozen away from a target, with pushes and pulls
+        There is no deadlock when there are more boxes than targets, a box can stay anywhere
+        '''
+        level = self.level
+        if len(self.box_cells) > len(level.target_cells):
+            return False
+
+        move_table = level.move_table
+        for cell in (box_cell,) + tuple(move_table[move][box_cell] for move in (LEFT, RIGHT, UP, DOWN)):
+            if cell == -1 or cell not in self.box_at or cell in level.target_cells:
+                continue
+
+            if self._frozen(cell, frozenset()):
+                return True
+
+        return False
 
     def copy(self):
-        ''' Returns a copy of the current state'''
-        new_map = Map(self.length, self.width, self.player.x, self.player.y, [(box.name, box.x, box.y) for box in self.boxes.values()], self.targets, self.obstacles)
-        new_map.map = [row.copy() for row in self.map]
-        new_map.positions_of_boxes = self.positions_of_boxes.copy()
-        new_map.explored_states = self.explored_states
-        new_map.undo_moves = self.undo_moves
+        ''' Returns a copy of the current state, sharing the same level'''
+        new_map = self.__class__.__new__(self.__class__)
+        new_map._set_state(
+            self.level,
+            self.player_cell,
+            self.box_cells.copy(),
+            self.explored_states,
+            self.undo_moves,
+            self._key,
+            self.boxes_on_targets,
+            self.box_at.copy()
+        )
         return new_map
 
     def get_neighbours(self):
@@ -389,21 +601,40 @@ class Map:
     def save_map(self, save_path: str, save_name: str):
         self._create_figure(show=False, save_path=save_path, save_name=save_name)
 
+    @property
+    def key(self) -> int:
+        '''
+        Returns the canonical key of the state, computed once and cached until the next move.
+        The key packs the box cells as a bitmask, followed by the cell of the player:
+        key = box_mask * (length * width) + player_cell, where cell = x * width + y
+        '''
+        if self._key is None:
+            box_mask = 0
+            for box_cell in self.box_cells:
+                box_mask |= 1 << box_cell
+
+            self._key = box_mask * self.level.size + self.player_cell
+
+        return self._key
+
     def __lt__(self, other):
-        return str(self) < str(other)
+        return self.key < other.key
 
     def __str__(self):
         ''' Overriding toString method for Map class'''
+        grid = self.map
+        player_x, player_y = self.level.position(self.player_cell)
+
         name = ''
         for i in range(self.length):
             for j in range(self.width):
-                if self.player.x == i and self.player.y == j:
-                    name += f"{self.player.get_symbol()} "
-                elif self.map[i][j] == 1:
+                if player_x == i and player_y == j:
+                    name += f"P "
+                elif grid[i][j] == OBSTACLE_SYMBOL:
                     name += f"/ "
-                elif self.map[i][j] == 2:
+                elif grid[i][j] == BOX_SYMBOL:
                     name += f"B "
-                elif self.map[i][j] == 3:
+                elif grid[i][j] == TARGET_SYMBOL:
                     name += f"X "
                 else:
                     name += f"_ "
@@ -415,7 +646,9 @@ class Map:
         return '\n'.join(aligned_corner)
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return hash(self.key)
     
     def __eq__(self, value: object) -> bool:
-        return str(self) == str(value)
+        if not isinstance(value, Map):
+            return False
+        return self.key == value.key
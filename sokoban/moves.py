@@ -1,7 +1,7 @@
 
 __all__ = ['LEFT', 'RIGHT', 'UP', 'DOWN', 
            'BOX_LEFT', 'BOX_RIGHT', 'BOX_UP', 'BOX_DOWN', 
-           'moves_meaning']
+           'moves_meaning', 'opposite_moves']
 
 # Moves
 LEFT = 1
@@ -24,3 +24,11 @@ moves_meaning = {
     BOX_UP:    'box_up',
     BOX_DOWN:  'box_down'
 }
+
+# Direction that undoes each walking move
+opposite_moves = {
+    LEFT:  RIGHT,
+    RIGHT: LEFT,
+    UP:    DOWN,
+    DOWN:  UP
+}
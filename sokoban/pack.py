@@ -0,0 +1,175 @@
+from .level import Level
+from .map import Map
+
+from array import array
+from typing import Iterable, Iterator, Optional
+import mmap
+import struct
+import sys
+
+
+__all__ = ['LevelPack', 'write_pack', 'pack_yaml', 'pack_str']
+
+# File header: magic, format version, number of levels, offset of the index
+HEADER = struct.Struct('<4sHIQ')
+MAGIC = b'SOKP'
+VERSION = 1
+
+# Level header: length, width, player cell, number of walls, boxes and targets, bytes of the name
+RECORD = struct.Struct('<HHIIHHH')
+
+
+def _cells(cells) -> bytes:
+    ''' Returns the cells packed as little-endian uint32'''
+    packed = array('I', cells)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _encode(s: Map) -> bytes:
+    ''' Returns the record of the level of s, with s as its start state'''
+    level = s.level
+    walls = [cell for cell in range(level.size) if level.walls[cell]]
+    name = level.test_name.encode()
+
+    return b''.join((
+        RECORD.pack(
+            level.length, level.width, s.player_cell,
+            len(walls), len(s.box_cells), len(level.ordered_target_cells), len(name)
+        ),
+        _cells(walls),
+        _cells(s.box_cells),
+        _cells(level.ordered_target_cells),
+        name,
+        '\n'.join(level.box_names).encode(),
+    ))
+
+
+def write_pack(path: str, maps: Iterable[Map]) -> int:
+    '''
+    Writes the maps to a level pack and returns the number of levels written.
+    Every level is stored as a fixed header followed by its wall, box and target cells (uint32),
+    its name and the names of its boxes; the index of the record offsets is written last,
+    so the maps can come from a generator.
+    '''
+    offsets = []
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+        for s in maps:
+            offsets.append(file.tell())
+            file.write(_encode(s))
+
+        offsets.append(file.tell())
+        file.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, len(offsets) - 1, offsets[-1]))
+
+    return len(offsets) - 1
+
+
+def pack_yaml(path: str, yaml_paths: Iterable[str]) -> int:
+    ''' Converts yaml levels to a level pack, the levels keep the names given by their files'''
+    return write_pack(path, (Map.from_yaml(yaml_path) for yaml_path in yaml_paths))
+
+
+def pack_str(path: str, state_strs: Iterable[str], names: Optional[Iterable[str]] = None) -> int:
+    ''' Converts levels in the Map.from_str format to a level pack, named by names if given (level0, level1... otherwise)'''
+    names = list(names) if names is not None else None
+
+    def maps():
+        for index, state_str in enumerate(state_strs):
+            s = Map.from_str(state_str)
+            s.level.test_name = names[index] if names is not None else f"level{index}"
+            yield s
+
+    return write_pack(path, maps())
+
+
+class LevelPack:
+    '''
+    Read-only level pack written by write_pack, memory-mapped
+
+    Opening a pack only reads its header, a level is decoded and its Map (and Level) built when it is
+    indexed, so loading one level of a large pack costs the same as loading one yaml file without the parse.
+
+    Attributes:
+    path: path of the pack
+    backend: Map class of the states created (Map or ArrayMap)
+    '''
+    def __init__(self, path: str, backend: type = Map):
+        self.path = path
+        self.backend = backend
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._count, index_offset = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a level pack")
+        if version != VERSION:
+            raise ValueError(f"Unsupported level pack version {version} in {path}")
+
+        self._offsets = struct.unpack_from(f'<{self._count + 1}Q', self._data, index_offset)
+
+    def _read_cells(self, offset: int, count: int) -> tuple:
+        return struct.unpack_from(f'<{count}I', self._data, offset)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Map:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('LevelPack index out of range')
+
+        offset = self._offsets[index]
+        length, width, player_cell, wall_count, box_count, target_count, name_size = RECORD.unpack_from(self._data, offset)
+        offset += RECORD.size
+
+        walls = self._read_cells(offset, wall_count)
+        offset += 4 * wall_count
+        box_cells = self._read_cells(offset, box_count)
+        offset += 4 * box_count
+        target_cells = self._read_cells(offset, target_count)
+        offset += 4 * target_count
+
+        name = self._data[offset:offset + name_size].decode()
+        box_names = self._data[offset + name_size:self._offsets[index + 1]].decode()
+        box_names = box_names.split('\n') if box_count else []
+
+        level = Level(
+            length, width,
+            [divmod(cell, width) for cell in target_cells],
+            [divmod(cell, width) for cell in walls],
+            box_names, name
+        )
+        return self.backend.from_level(level, player_cell, box_cells)
+
+    def __iter__(self) -> Iterator[Map]:
+        return (self[index] for index in range(self._count))
+
+    def names(self) -> list:
+        ''' Returns the names of the levels, without building them'''
+        names = []
+        for offset in self._offsets[:-1]:
+            _, _, _, wall_count, box_count, target_count, name_size = RECORD.unpack_from(self._data, offset)
+            start = offset + RECORD.size + 4 * (wall_count + box_count + target_count)
+            names.append(self._data[start:start + name_size].decode())
+        return names
+
+    def close(self) -> None:
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"LevelPack({self.path}, {self._count} levels)"
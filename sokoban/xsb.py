@@ -0,0 +1,164 @@
+from .map import Map
+
+from typing import Iterable, Iterator, List, TextIO, Union
+import os
+
+
+__all__ = ['parse_level', 'parse_xsb', 'read_xsb', 'to_xsb', 'write_xsb']
+
+WALL = '#'
+PLAYER = '@'
+PLAYER_ON_TARGET = '+'
+BOX = '$'
+BOX_ON_TARGET = '*'
+TARGET = '.'
+FLOORS = ' -_'
+
+LEVEL_CHARS = frozenset(WALL + PLAYER + PLAYER_ON_TARGET + BOX + BOX_ON_TARGET + TARGET + FLOORS)
+
+
+def _is_level_row(line: str) -> bool:
+    ''' Checks if the line is a row of a level: only XSB symbols, not blank'''
+    return bool(line.strip()) and all(char in LEVEL_CHARS for char in line)
+
+
+def parse_level(rows: List[str], name: str = 'test', backend: type = Map) -> Map:
+    '''
+    Builds the start state of a level from its XSB rows, top row first.
+    As in Map.from_str, the top row gets the highest x; the rows are padded with floor to the widest one.
+    The floor outside of the walls is kept as floor, the player can't reach it.
+    '''
+    length = len(rows)
+    width = max((len(row) for row in rows), default=0)
+
+    player_x = player_y = None
+    boxes = []
+    targets = []
+    obstacles = []
+
+    for row_index, row in enumerate(rows):
+        i = length - 1 - row_index
+        for j, char in enumerate(row):
+            if char == WALL:
+                obstacles.append((i, j))
+                continue
+
+            if char in (PLAYER, PLAYER_ON_TARGET):
+                if player_x is not None:
+                    raise ValueError(f"Level {name} has more than one player")
+                player_x, player_y = i, j
+            elif char in (BOX, BOX_ON_TARGET):
+                boxes.append((f"box{i}_{j}", i, j))
+
+            if char in (TARGET, BOX_ON_TARGET, PLAYER_ON_TARGET):
+                targets.append((i, j))
+
+    if player_x is None:
+        raise ValueError(f"Level {name} has no player")
+
+    s = Map(length, width, player_x, player_y, boxes, targets, obstacles, test_name=name)
+    return s if backend is Map else backend.from_map(s)
+
+
+def parse_xsb(lines: Iterable[str], prefix: str = 'level', backend: type = Map) -> Iterator[Map]:
+    '''
+    Yields the levels of an XSB text one at a time, reading the lines lazily.
+    A level is a block of consecutive rows made of #@+$*. and floor (space, - or _), any other line ends it.
+    A 'Title:' line names the level it follows (or the next one if it comes first), the others are
+    named prefix1, prefix2... in the order of the file. Comments (;) and other metadata lines are skipped.
+    '''
+    rows = []
+    pending = None  # Rows of the last level read, yielded once its title can't follow anymore
+    title = None
+    index = 0
+
+    def build(level_rows, level_title):
+        nonlocal index
+        index += 1
+        return parse_level(level_rows, level_title or f"{prefix}{index}", backend)
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+
+        if _is_level_row(line):
+            if not rows and pending is not None:
+                yield build(*pending)
+                pending = None
+            rows.append(line)
+            continue
+
+        if rows:
+            pending = (rows, title)
+            rows = []
+            title = None
+
+        if line.strip().lower().startswith('title:'):
+            level_title = line.strip()[len('title:'):].strip()
+            if pending is not None and pending[1] is None:
+                pending = (pending[0], level_title)
+            else:
+                title = level_title
+
+    if rows:
+        if pending is not None:
+            yield build(*pending)
+        yield build(rows, title)
+    elif pending is not None:
+        yield build(*pending)
+
+
+def read_xsb(source: Union[str, TextIO], backend: type = Map) -> Iterator[Map]:
+    '''
+    Yields the levels of an XSB file (path or open text file) one at a time, without reading the whole file.
+    The untitled levels of a path are named after the file: microban.xsb gives microban1, microban2...
+    e.g. write_pack('microban.pack', read_xsb('microban.xsb')) converts the file to a level pack.
+    '''
+    if not isinstance(source, str):
+        yield from parse_xsb(source, backend=backend)
+        return
+
+    prefix = os.path.splitext(os.path.basename(source))[0]
+    with open(source) as file:
+        yield from parse_xsb(file, prefix, backend)
+
+
+def to_xsb(s: Map, floor: str = '-') -> str:
+    '''
+    Returns the state as XSB rows, top row first, boxes and player on a target written as * and +.
+    The floor is written as - by default, so that the levels not closed by walls (like the yaml test levels)
+    keep their outer floor: a row of spaces would end the level and trailing spaces would be trimmed.
+    With floor=' ', the trailing floor of the rows is dropped, only for levels closed by walls.
+    '''
+    level = s.level
+    box_cells = set(s.box_cells)
+
+    rows = []
+    for i in reversed(range(level.length)):
+        row = ''
+        for j in range(level.width):
+            cell = level.cell(i, j)
+            target = cell in level.target_cells
+
+            if level.walls[cell]:
+                row += WALL
+            elif cell == s.player_cell:
+                row += PLAYER_ON_TARGET if target else PLAYER
+            elif cell in box_cells:
+                row += BOX_ON_TARGET if target else BOX
+            else:
+                row += TARGET if target else floor
+
+        rows.append(row.rstrip(' '))
+
+    return '\n'.join(rows)
+
+
+def write_xsb(path: str, maps: Iterable[Map], floor: str = '-') -> int:
+    ''' Writes the states to an XSB file, each level followed by its title and a blank line, returns the number of levels'''
+    count = 0
+    with open(path, 'w') as file:
+        for s in maps:
+            file.write(f"{to_xsb(s, floor)}\nTitle: {s.test_name}\n\n")
+            count += 1
+
+    return count